@@ -0,0 +1,359 @@
+import argparse
+import os
+
+# Cohort analytics kept as rollup tables next to the results in the store of
+# store.py: every student's rank in their cohort (institution, batch,
+# programme, semester and examination), per-cohort CGPA statistics, per-paper
+# pass rates and mark distributions, and every student's cumulative CGPA over
+# the semesters stored for them, ranked within their batch and programme.
+#
+# The rollups are updated in the transaction that ingests or removes a
+# gazette, for the cohorts and students of that gazette only, so adding a
+# semester does not reprocess the semesters stored before it. Queries read
+# the rollups and return pandas DataFrames.
+#
+#     python analytics.py ranks --batch 2021 --programme "BACHELOR OF TECHNOLOGY (CSE)" --sem 01 --top 10
+#     python analytics.py distribution ES101 --batch 2021
+#     python analytics.py cumulative --enrollment 01320802722
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS student_terms (
+    student_id INTEGER PRIMARY KEY REFERENCES students (id) ON DELETE CASCADE,
+    papers INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    credits REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cohort_ranks (
+    student_id INTEGER PRIMARY KEY REFERENCES students (id) ON DELETE CASCADE,
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT,
+    cgpa REAL NOT NULL,
+    rank INTEGER NOT NULL,
+    cohort_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cohorts (
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT,
+    students INTEGER NOT NULL,
+    ranked INTEGER NOT NULL,
+    passed_all INTEGER NOT NULL,
+    mean_cgpa REAL,
+    max_cgpa REAL,
+    min_cgpa REAL
+);
+CREATE TABLE IF NOT EXISTS paper_stats (
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT,
+    paper TEXT,
+    students INTEGER NOT NULL,
+    appeared INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    mean_total REAL,
+    min_total INTEGER,
+    max_total INTEGER
+);
+CREATE TABLE IF NOT EXISTS paper_marks (
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT,
+    paper TEXT,
+    total INTEGER NOT NULL,
+    students INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cumulative (
+    enrollment TEXT PRIMARY KEY,
+    name TEXT,
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    semesters INTEGER NOT NULL,
+    credits REAL NOT NULL,
+    cgpa REAL NOT NULL,
+    rank INTEGER,
+    cohort_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS cohort_ranks_cohort ON cohort_ranks (batch, programme, sem, examination, rank);
+CREATE INDEX IF NOT EXISTS cohorts_cohort ON cohorts (batch, programme, sem, examination);
+CREATE INDEX IF NOT EXISTS paper_stats_cohort ON paper_stats (batch, programme, sem, examination);
+CREATE INDEX IF NOT EXISTS paper_stats_paper ON paper_stats (paper, batch);
+CREATE INDEX IF NOT EXISTS paper_marks_cohort ON paper_marks (batch, programme, sem, examination);
+CREATE INDEX IF NOT EXISTS paper_marks_paper ON paper_marks (paper, batch, programme, sem, examination);
+CREATE INDEX IF NOT EXISTS cumulative_cohort ON cumulative (batch, programme, institution, rank);
+-- The rollups of a cohort are recomputed from its students
+CREATE INDEX IF NOT EXISTS students_rollup ON students (batch, programme, sem, examination, institution);
+"""
+
+# Cohorts and students whose rollups are out of date, per connection until
+# the next refresh()
+TOUCHED = """
+CREATE TEMP TABLE IF NOT EXISTS touched_cohorts (
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT
+);
+CREATE TEMP TABLE IF NOT EXISTS touched_students (enrollment TEXT PRIMARY KEY);
+"""
+
+COHORT = ['institution', 'batch', 'programme', 'sem', 'examination']
+# Cumulative CGPAs are ranked within these
+PROGRAMME = ['institution', 'batch', 'programme']
+
+# Query filter -> rollup column; every rollup table has the cohort columns
+FILTERS = {column: column for column in COHORT}
+
+
+def same(left, right, columns=COHORT):
+    # Join condition on the cohort columns, with NULL matching NULL
+    return ' AND '.join(f'{left}.{column} IS {right}.{column}' for column in columns)
+
+
+def attach(conn):
+    # Create the rollup tables in the store; a store filled before they
+    # existed is rolled up once, here
+    conn.executescript(SCHEMA + TOUCHED)
+    stale = conn.execute('SELECT 1 FROM students s LEFT JOIN student_terms t ON t.student_id = s.id '
+                         'WHERE t.student_id IS NULL LIMIT 1').fetchone()
+    if stale is not None:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rebuild(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+def touch(conn, gazette_id):
+    # Mark the cohorts and students of a stored gazette as out of date;
+    # called for a gazette before it is removed and after it is inserted
+    conn.execute(f"INSERT INTO touched_cohorts SELECT DISTINCT {', '.join(COHORT)} FROM students "
+                 'WHERE gazette_id = ?', (gazette_id,))
+    conn.execute('INSERT OR IGNORE INTO touched_students SELECT DISTINCT enrollment FROM students '
+                 'WHERE gazette_id = ? AND enrollment IS NOT NULL', (gazette_id,))
+
+
+def add_terms(conn, gazette_id=None):
+    # Paper counts, passes and counted credits of the students of a gazette,
+    # or of every student, from their papers. A paper passes with a grade
+    # above the fail grade. Credits count where the paper counts towards the
+    # semester CGPA (papers.counts_for_cgpa, set by the layout's cleaning);
+    # papers stored before that flag count when they have a total.
+    from cgpa import GRADE_TABLE
+
+    where, params = optional('s.gazette_id', gazette_id)
+    conn.execute(
+        'INSERT OR REPLACE INTO student_terms (student_id, papers, passed, credits) '
+        'SELECT s.id, COUNT(p.paper), COUNT(CASE WHEN p.total >= ? THEN 1 END), '
+        'COALESCE(SUM(CASE WHEN COALESCE(p.counts_for_cgpa, p.total IS NOT NULL) THEN p.credits END), 0) '
+        'FROM students s LEFT JOIN papers p ON p.student_id = s.id'
+        + ''.join(f' WHERE {condition}' for condition in where) + ' GROUP BY s.id',
+        (GRADE_TABLE[0][0],) + params,
+    )
+
+
+def refresh(conn):
+    # Recompute the rollups of the touched cohorts and students, inside the
+    # caller's transaction
+    from cgpa import GRADE_TABLE
+
+    cohort = ', '.join(COHORT)
+    s_cohort = ', '.join(f's.{column}' for column in COHORT)
+    # Every statement starts from the touched cohorts or students and looks
+    # the rest up by index; CROSS JOIN keeps SQLite from scanning the whole
+    # store instead
+    touched = 'WITH t AS (SELECT DISTINCT * FROM touched_cohorts) '
+    students = f'FROM t CROSS JOIN students s INDEXED BY students_rollup ON {same("s", "t")}'
+    for table in ('cohort_ranks', 'cohorts', 'paper_stats', 'paper_marks'):
+        conn.execute(touched + f'DELETE FROM {table} WHERE rowid IN '
+                     f'(SELECT x.rowid FROM t CROSS JOIN {table} x ON {same("x", "t")})')
+
+    conn.execute(
+        touched + f'INSERT INTO cohort_ranks (student_id, {cohort}, cgpa, rank, cohort_size) '
+        f'SELECT s.id, {s_cohort}, s.cgpa, RANK() OVER w, COUNT(*) OVER (PARTITION BY {s_cohort}) '
+        f'{students} WHERE s.cgpa IS NOT NULL WINDOW w AS (PARTITION BY {s_cohort} ORDER BY s.cgpa DESC)'
+    )
+    conn.execute(
+        touched + f'INSERT INTO cohorts ({cohort}, students, ranked, passed_all, mean_cgpa, max_cgpa, min_cgpa) '
+        f'SELECT {s_cohort}, COUNT(*), COUNT(s.cgpa), COUNT(CASE WHEN st.passed = st.papers THEN 1 END), '
+        f'AVG(s.cgpa), MAX(s.cgpa), MIN(s.cgpa) '
+        f'{students} JOIN student_terms st ON st.student_id = s.id GROUP BY {s_cohort}'
+    )
+    conn.execute(
+        touched + f'INSERT INTO paper_stats ({cohort}, paper, students, appeared, passed, mean_total, min_total, '
+        f'max_total) SELECT {s_cohort}, p.paper, COUNT(*), COUNT(p.total), COUNT(CASE WHEN p.total >= ? THEN 1 END), '
+        f'AVG(p.total), MIN(p.total), MAX(p.total) '
+        f'{students} JOIN papers p ON p.student_id = s.id WHERE p.paper IS NOT NULL GROUP BY {s_cohort}, p.paper',
+        (GRADE_TABLE[0][0],),
+    )
+    conn.execute(
+        touched + f'INSERT INTO paper_marks ({cohort}, paper, total, students) '
+        f'SELECT {s_cohort}, p.paper, p.total, COUNT(*) '
+        f'{students} JOIN papers p ON p.student_id = s.id '
+        f'WHERE p.paper IS NOT NULL AND p.total IS NOT NULL GROUP BY {s_cohort}, p.paper, p.total'
+    )
+
+    # Cumulative CGPA: the semester CGPAs weighted by the credits counted in
+    # them. Only regular results have a CGPA; a semester stored more than
+    # once counts with its latest result. Name, batch and programme come
+    # from the latest semester (SQLite takes the bare columns from the MAX()
+    # row).
+    conn.execute('DELETE FROM cumulative WHERE enrollment IN (SELECT enrollment FROM touched_students)')
+    conn.execute(
+        'WITH latest AS ('
+        '    SELECT MAX(s.id) AS id FROM touched_students t CROSS JOIN students s ON s.enrollment = t.enrollment '
+        '    WHERE s.cgpa IS NOT NULL GROUP BY s.enrollment, s.sem'
+        ') '
+        'INSERT INTO cumulative (enrollment, name, institution, batch, programme, semesters, credits, cgpa) '
+        'SELECT enrollment, name, institution, batch, programme, semesters, credits, '
+        '       CASE WHEN credits > 0 THEN ROUND(points / credits, 2) ELSE 0 END '
+        'FROM ('
+        '    SELECT s.enrollment, s.name, s.institution, s.batch, s.programme, MAX(s.id), COUNT(*) AS semesters, '
+        '           SUM(st.credits) AS credits, SUM(s.cgpa * st.credits) AS points '
+        '    FROM latest JOIN students s ON s.id = latest.id JOIN student_terms st ON st.student_id = s.id '
+        '    GROUP BY s.enrollment'
+        ')'
+    )
+    # Ranks change for everyone in the programmes the touched cohorts belong to
+    conn.execute(
+        'UPDATE cumulative SET rank = r.rank, cohort_size = r.cohort_size FROM ('
+        f"    SELECT c.enrollment, RANK() OVER (PARTITION BY {', '.join(f'c.{column}' for column in PROGRAMME)} "
+        '           ORDER BY c.cgpa DESC) AS rank, '
+        f"           COUNT(*) OVER (PARTITION BY {', '.join(f'c.{column}' for column in PROGRAMME)}) AS cohort_size "
+        f"    FROM (SELECT DISTINCT {', '.join(PROGRAMME)} FROM touched_cohorts) t "
+        f'    CROSS JOIN cumulative c INDEXED BY cumulative_cohort ON {same("c", "t", PROGRAMME)}'
+        ') r WHERE cumulative.enrollment = r.enrollment'
+    )
+    conn.execute('DELETE FROM touched_cohorts')
+    conn.execute('DELETE FROM touched_students')
+
+
+def rebuild(conn):
+    # Every rollup from scratch, inside the caller's transaction
+    conn.execute(f"INSERT INTO touched_cohorts SELECT DISTINCT {', '.join(COHORT)} FROM students")
+    conn.execute('INSERT OR IGNORE INTO touched_students SELECT DISTINCT enrollment FROM students '
+                 'WHERE enrollment IS NOT NULL')
+    add_terms(conn)
+    refresh(conn)
+
+
+def select(conn, sql, filters, order, top=None, where=(), params=(), group=None):
+    # DataFrame of sql with the where conditions and the cohort filters that
+    # are not None, grouped by group and in order; with top, only the rows up
+    # to that rank. Rollup columns are selected through the alias r.
+    import pandas as pd
+
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    where = list(where) + [f'r.{FILTERS[key]} = ?' for key, value in filters.items() if value is not None]
+    params = list(params) + [value for value in filters.values() if value is not None]
+    if top is not None:
+        where.append('r.rank <= ?')
+        params.append(top)
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if group is not None:
+        sql += f' GROUP BY {group}'
+    cursor = conn.execute(f'{sql} ORDER BY {order}', params)
+    return pd.DataFrame([tuple(row) for row in cursor], columns=[column[0] for column in cursor.description])
+
+
+def optional(column, value):
+    # Where condition and parameters for an optional equality filter
+    return ([f'{column} = ?'], (value,)) if value is not None else ([], ())
+
+
+def cohorts(conn, **filters):
+    # Students, passes and CGPA statistics per cohort
+    return select(conn, 'SELECT r.* FROM cohorts r', filters, 'r.batch, r.programme, r.sem, r.examination')
+
+
+def ranks(conn, enrollment=None, top=None, **filters):
+    # Students by rank in their cohort, or every semester rank of one
+    # student; only results with a CGPA are ranked
+    where, params = optional('s.enrollment', enrollment)
+    return select(conn, 'SELECT r.institution, r.batch, r.programme, r.sem, r.examination, s.enrollment, s.name, '
+                        'r.cgpa, r.rank, r.cohort_size FROM cohort_ranks r JOIN students s ON s.id = r.student_id',
+                  filters, 'r.batch, r.programme, r.sem, r.examination, r.rank, s.enrollment', top, where, params)
+
+
+def paper_stats(conn, paper=None, **filters):
+    # Per cohort and paper: students, those with a total, passes, and the
+    # mean, lowest and highest total
+    where, params = optional('r.paper', paper)
+    return select(conn, 'SELECT r.* FROM paper_stats r', filters, 'r.batch, r.programme, r.sem, r.examination, r.paper',
+                  where=where, params=params)
+
+
+def distribution(conn, paper, **filters):
+    # Students per total in one paper, over every cohort matching the filters
+    return select(conn, 'SELECT r.total, SUM(r.students) AS students FROM paper_marks r', filters, 'r.total',
+                  where=['r.paper = ?'], params=(paper,), group='r.total')
+
+
+def cumulative(conn, enrollment=None, top=None, institution=None, batch=None, programme=None):
+    # Cumulative CGPA and its rank within the batch and programme
+    where, params = optional('r.enrollment', enrollment)
+    return select(conn, 'SELECT r.* FROM cumulative r',
+                  {'institution': institution, 'batch': batch, 'programme': programme},
+                  'r.batch, r.programme, r.rank, r.enrollment', top, where, params)
+
+
+def main(argv=None):
+    from store import DEFAULT_STORE_PATH, ResultStore
+
+    parser = argparse.ArgumentParser(description='Ranks and statistics from the rollups of the result store')
+    parser.add_argument('--db', default=DEFAULT_STORE_PATH, help='store file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    queries = {
+        'cohorts': commands.add_parser('cohorts', help='CGPA statistics per cohort'),
+        'ranks': commands.add_parser('ranks', help='students by rank in their cohort'),
+        'papers': commands.add_parser('papers', help='pass rates and totals per paper'),
+        'distribution': commands.add_parser('distribution', help='students per total in one paper'),
+        'cumulative': commands.add_parser('cumulative', help='cumulative CGPA and rank over semesters'),
+    }
+    commands.add_parser('rebuild', help='recompute every rollup')
+    queries['distribution'].add_argument('paper')
+    queries['papers'].add_argument('--paper')
+    for name in ('ranks', 'cumulative'):
+        queries[name].add_argument('--enrollment')
+        queries[name].add_argument('--top', type=int)
+    for name, query in queries.items():
+        for option in PROGRAMME if name == 'cumulative' else COHORT:
+            query.add_argument(f'--{option}')
+    args = parser.parse_args(argv)
+
+    if args.command != 'rebuild' and not os.path.exists(args.db):
+        parser.error(f"no result store at {args.db}")
+    with ResultStore(args.db) as store:
+        conn = store.conn
+        if args.command == 'rebuild':
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rebuild(conn)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return
+        options = {key: value for key, value in vars(args).items() if key not in ('db', 'command')}
+        table = {'cohorts': cohorts, 'ranks': ranks, 'papers': paper_stats, 'distribution': distribution,
+                 'cumulative': cumulative}[args.command](conn, **options)
+        print(table.to_csv(index=False), end='')
+
+
+if __name__ == '__main__':
+    main()
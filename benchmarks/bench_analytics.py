@@ -0,0 +1,142 @@
+# Cohort analytics from the rollups of analytics.py against computing them
+# ad hoc from the stored long table. One synthetic gazette is extracted and
+# stored as --batches batches x --semesters semesters, each batch with its
+# own enrollment numbers kept across its semesters. Then one more semester
+# is ingested, which updates the rollups of its cohorts only, and the time
+# is compared with rolling up the whole store again. Finally rank,
+# distribution and cumulative CGPA queries are timed both ways.
+#
+#     python benchmarks/bench_analytics.py --batches 20 --semesters 6
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import analytics
+from columnar import extract_table
+from engine import ALL_INSTITUTIONS
+from store import ResultStore
+from synth import make_gazette
+
+COHORT = ['Institution', 'Batch', 'Programme Name', 'Sem', 'Examination']
+
+
+def semester(sample, batch, sem):
+    table = sample.copy()
+    table['Batch'] = table['Batch'] + f'-{batch}'
+    table['Enrollment'] = table['Enrollment'] + f'{batch:04d}'
+    table['Sem'] = f'{sem:02d}'
+    return table
+
+
+def median_ms(query, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def adhoc_toppers(store, batch, top):
+    long = store.query(batch=batch)
+    students = long.drop_duplicates(COHORT + ['Enrollment']).dropna(subset=['CGPA'])
+    students = students.assign(Rank=students.groupby(COHORT)['CGPA'].rank(method='min', ascending=False))
+    return students[students['Rank'] <= top]
+
+
+def adhoc_distribution(store, paper):
+    return store.query(paper=paper).groupby('Total').size()
+
+
+def adhoc_cumulative(store, enrollment):
+    # Every student of the batch and programme is needed for the rank
+    student = store.student(enrollment)
+    long = store.query(batch=student['Batch'].iloc[0], programme=student['Programme Name'].iloc[0])
+    students = long.drop_duplicates(COHORT + ['Enrollment']).dropna(subset=['CGPA'])
+    credits = long[long['Counts_For_CGPA'].fillna(False)].groupby(COHORT + ['Enrollment'])['Credits'].sum()
+    students = students.join(credits.rename('Counted'), on=COHORT + ['Enrollment'])
+    students['Points'] = students['CGPA'] * students['Counted']
+    totals = students.groupby('Enrollment')[['Points', 'Counted']].sum()
+    cgpa = (totals['Points'] / totals['Counted']).round(2)
+    return cgpa.rank(method='min', ascending=False)[enrollment]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time rollup updates and analytics queries')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--semesters', type=int, default=6)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, pages=args.pages, students_per_page=10, pages_per_programme=10)
+        sample = extract_table(pdf, args.format, ALL_INSTITUTIONS)
+
+        store = ResultStore(os.path.join(tmp, 'results.sqlite'))
+        start = time.perf_counter()
+        for batch in range(args.batches):
+            for sem in range(1, args.semesters + 1):
+                store.ingest_table(semester(sample, batch, sem), f'{batch}-{sem}', None, args.format)
+        fill_seconds = time.perf_counter() - start
+        conn = store.conn
+        students = conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+        rows = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+        # One more semester for the middle batch, with and without rollups
+        batch = args.batches // 2
+        table = semester(sample, batch, args.semesters + 1)
+        start = time.perf_counter()
+        store.ingest_table(table, 'new', None, args.format)
+        with_rollups = time.perf_counter() - start
+        refresh = analytics.refresh
+        analytics.refresh = lambda conn: conn.execute('DELETE FROM touched_cohorts')
+        try:
+            start = time.perf_counter()
+            store.ingest_table(table, 'new', None, args.format)
+            without_rollups = time.perf_counter() - start
+        finally:
+            analytics.refresh = refresh
+        conn.execute('BEGIN IMMEDIATE')
+        start = time.perf_counter()
+        analytics.rebuild(conn)
+        rebuild_seconds = time.perf_counter() - start
+        conn.execute('COMMIT')
+
+        print(f"{students} student results, {rows} paper rows in {args.batches * args.semesters} gazettes "
+              f"(stored in {fill_seconds:.1f}s)")
+        print(f"ingesting one more semester: {without_rollups * 1000:.0f} ms, "
+              f"{with_rollups * 1000:.0f} ms with its rollups "
+              f"(+{(with_rollups - without_rollups) * 1000:.0f} ms); "
+              f"rolling up the whole store: {rebuild_seconds * 1000:.0f} ms")
+
+        last = sample.iloc[-1]
+        name = f"{last['Batch']}-{batch}"
+        enrollment = last['Enrollment'] + f'{batch:04d}'
+        queries = {
+            'toppers': (lambda: analytics.ranks(conn, batch=name, top=10),
+                        lambda: adhoc_toppers(store, name, 10)),
+            'distribution': (lambda: analytics.distribution(conn, last['Paper']),
+                             lambda: adhoc_distribution(store, last['Paper'])),
+            'cumulative': (lambda: analytics.cumulative(conn, enrollment=enrollment),
+                           lambda: adhoc_cumulative(store, enrollment)),
+        }
+        expected = analytics.cumulative(conn, enrollment=enrollment)['rank'].iloc[0]
+        assert adhoc_cumulative(store, enrollment) == expected
+        print(f"{'query':14s} {'rollups':>10s} {'ad hoc':>10s}")
+        for label, (rollup, adhoc) in queries.items():
+            fast, slow = median_ms(rollup, args.repeat), median_ms(adhoc, args.repeat)
+            print(f"{label:14s} {fast:8.2f}ms {slow:8.1f}ms  {slow / fast:6.0f}x")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
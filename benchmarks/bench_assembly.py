@@ -0,0 +1,85 @@
+# Table assembly on long runs of pages from one programme: the old grouping
+# loop, which concatenated every page onto the group built so far, against
+# engine.group_tables, which collects a group's tables and concatenates them
+# once. The page tables come from a small synthetic gazette and are repeated
+# to --pages pages, all with the same metadata.
+#
+#     python benchmarks/bench_assembly.py --pages 500 1000 2000
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import pandas as pd
+
+from engine import extract_pages, group_tables
+from records import layout_for
+from synth import make_gazette
+
+
+def concat_per_page(pages, layout):
+    # The grouping loop before group_tables, kept as the reference
+    previous_metadata = None
+    previous_df = None
+    result_dfs = []
+    for page in pages:
+        metadata = page['metadata']
+        for table in page['tables']:
+            for key in layout['metadata_keys']:
+                table[key] = metadata.get(key)
+            current_metadata = tuple(metadata.get(key) for key in layout['group_keys'])
+            if previous_metadata and current_metadata == previous_metadata:
+                previous_df = pd.concat([previous_df, table], ignore_index=True)
+            else:
+                if previous_df is not None and not previous_df.empty:
+                    result_dfs.append(previous_df)
+                previous_metadata = current_metadata
+                previous_df = table
+    if previous_df is not None and not previous_df.empty:
+        result_dfs.append(previous_df)
+    return result_dfs
+
+
+def timed(assemble, pages, layout, repeat):
+    # Best seconds of assemble over fresh copies of the pages, and its result
+    best = None
+    for _ in range(repeat):
+        run = copy.deepcopy(pages)
+        start = time.perf_counter()
+        result = assemble(run, layout)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time table assembly on long single-programme runs')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, nargs='+', default=[250, 500, 1000, 2000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    layout = layout_for(args.format)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, pages=4, students_per_page=10, pages_per_programme=4)
+        sample = extract_pages(pdf, layout)
+
+    print(f"{'pages':>6s} {'rows':>8s} {'concat per page':>16s} {'group_tables':>13s} {'speedup':>8s}")
+    for count in args.pages:
+        pages = [dict(sample[i % len(sample)], page=i + 1) for i in range(count)]
+        before, expected = timed(concat_per_page, pages, layout, args.repeat)
+        after, result = timed(group_tables, pages, layout, args.repeat)
+        # Same rows, apart from the 'Page' column group_tables adds
+        assert len(result) == len(expected) == 1
+        pd.testing.assert_frame_equal(result[0].drop(columns='Page'), expected[0])
+        print(f"{count:6d} {len(result[0]):8d} {before * 1000:14.0f}ms {after * 1000:11.0f}ms {before / after:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Page header parsing: one re.search per field over the page text, as the
+# layouts did before, against the single-scan headers.HeaderParser. Page
+# texts are synthetic headers followed by a result table body, like the text
+# engine.read_page passes to extract_data.
+#
+#     python benchmarks/bench_headers.py --pages 5000
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from layouts import LAYOUTS
+from synth import OTHER_INSTITUTIONS, SEMESTERS, header_lines
+
+# The per-field patterns the layouts used before HeaderParser
+SEARCH_PATTERNS = {
+    'format1': [
+        ('Programme Name', r'Programme Name:\s*([^\n]*?)(?=Sem\./Year|$)'),
+        ('Sem./Year', r'Sem\./Year:\s*([^\n]*?)(?=Batch|$)'),
+        ('Batch', r'Batch:\s*([^\n]*?)(?=Examination|$)'),
+        ('Examination', r'Examination:\s*([^\n]*)'),
+        ('Institution', r'Institution:\s*([^\n]*?)(?=CS/Remarks|$)'),
+    ],
+    'format2': [
+        ('Programme Name', r'Programme Name:\s*([^\n]*?)(?=Sem\./Year|$)'),
+        ('Sem./Year/EU', r'Sem\./Year/EU:\s*([^\n]*?)(?=Batch|$)'),
+        ('Batch', r'Batch:\s*([^\n]*?)(?=Examination|$)'),
+        ('Examination', r'Examination:\s*([^\n]*?)(?=Result Declared Date|$)'),
+        ('Institution', r'Institution:\s*([^\n]*?)(?=CS/Remarks|$)'),
+    ],
+}
+
+
+def search_fields(patterns, text):
+    data = {}
+    for key, pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        data[key] = match.group(1).strip() if match else None
+    return data
+
+
+def page_texts(fmt, pages, rows, seed=0):
+    rnd = random.Random(seed)
+    body = '\n'.join(' '.join(str(rnd.randint(0, 99)) for _ in range(16)) for _ in range(rows))
+    texts = []
+    for _ in range(pages):
+        lines = header_lines(fmt, f'BACHELOR OF TECHNOLOGY (BRANCH {rnd.randint(1, 9)})', rnd.choice(SEMESTERS),
+                             str(rnd.randint(2015, 2024)), rnd.choice(OTHER_INSTITUTIONS))
+        texts.append('\n'.join(lines) + '\nS.No. Roll no./Name Paper1 Paper2 CS/Remarks\n' + body)
+    return texts
+
+
+def best_of(function, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-field regex searches with HeaderParser')
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=50, help='table lines after each header')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for fmt, patterns in SEARCH_PATTERNS.items():
+        texts = page_texts(fmt, args.pages, args.rows)
+        header = LAYOUTS[fmt]['header']
+        for text in texts:
+            fields = header(text)
+            assert {key: fields[key] for key, _ in patterns} == search_fields(patterns, text)
+
+        search = best_of(lambda text: search_fields(patterns, text), texts, args.repeat)
+        single = best_of(header, texts, args.repeat)
+        print(f"{fmt}: {args.pages} page headers")
+        print(f"  {'re.search per field':20s} {search * 1e6 / args.pages:7.2f} us/page")
+        print(f"  {'HeaderParser':20s} {single * 1e6 / args.pages:7.2f} us/page  ({search / single:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Peak RSS of parsing every page of a long gazette: pages kept with their
+# caches until the document is closed (the old loop), pages released right
+# after parsing (the default), and pages parsed in windows under --budget MB,
+# which also bounds pdfminer's per-document object caches. Each mode runs in
+# a fresh interpreter so the peaks do not mix.
+#
+#     python benchmarks/bench_memory.py --pages 1000 --budget 256
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from engine import ALL_INSTITUTIONS, iter_pages, open_source, parse_page
+from memory import current_rss_mb, peak_rss_mb
+from metrics import collect
+from records import layout_for
+from synth import make_gazette
+
+
+def keep_pages(pdf_path, layout):
+    # The loop before pages were released: every page object stays alive
+    # with its chars and layout until the document is closed
+    import pdfplumber
+
+    with open_source(pdf_path) as stream, pdfplumber.open(stream) as pdf:
+        for page in pdf.pages:
+            yield parse_page(page, layout, 'words')
+
+
+def child(mode, pdf_path, fmt, budget):
+    layout = layout_for(fmt)
+    rss_before = current_rss_mb()
+    samples = []
+    start = time.perf_counter()
+    with collect() as metrics:
+        if mode == 'keep':
+            pages = keep_pages(pdf_path, layout)
+        else:
+            pages = iter_pages(pdf_path, layout, ALL_INSTITUTIONS, prefilter=False,
+                               memory_budget=budget if mode == 'budget' else None)
+        for n, _ in enumerate(pages, 1):
+            if n % 100 == 0:
+                samples.append(round(current_rss_mb()))
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'rss_before_mb': rss_before,
+        'peak_mb': peak_rss_mb(),
+        'samples': samples,
+        'windows': metrics.counters.get('page_windows'),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare peak RSS of page processing with and without a budget')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, default=1000, help='pages in the generated gazette')
+    parser.add_argument('--pdf', help='use this PDF instead of generating one')
+    parser.add_argument('--budget', type=float, default=256, help='memory budget in MB')
+    parser.add_argument('--modes', default='keep,release,budget')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.format, args.budget)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf
+        if pdf is None:
+            pdf = os.path.join(tmp, 'gazette.pdf')
+            make_gazette(pdf, args.format, args.pages, students_per_page=10)
+        labels = {'keep': 'pages kept', 'release': 'pages released', 'budget': f'budget {args.budget:.0f} MB'}
+        for mode in args.modes.split(','):
+            out = subprocess.run([sys.executable, __file__, '--format', args.format, '--budget', str(args.budget),
+                                  '--child', mode, pdf], check=True, capture_output=True, text=True).stdout
+            run = json.loads(out.splitlines()[-1])
+            windows = f", {run['windows']} windows" if run['windows'] else ''
+            print(f"{labels[mode]:16s} peak RSS {run['rss_before_mb']:5.0f} -> {run['peak_mb']:6.0f} MB "
+                  f"in {run['seconds']:.1f}s{windows}")
+            print(f"{'':16s} RSS every 100 pages: {' '.join(str(mb) for mb in run['samples'])}")
+
+
+if __name__ == '__main__':
+    main()
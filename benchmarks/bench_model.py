@@ -0,0 +1,93 @@
+# Memory of 100k extracted students: the nested dict result and the cleaned
+# DataFrame with list columns, against model.ResultSet.
+#
+#     python benchmarks/bench_model.py --students 100000
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import pandas as pd
+
+from engine import clean_tables, extract_pages, nest_results
+from model import ResultSet
+from records import layout_for
+from synth import make_gazette
+
+
+def measure(build):
+    # (value, bytes still allocated by it)
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(build):
+    # Seconds of a build outside tracemalloc, which slows allocation down
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory of nested results and model.ResultSet')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--papers', type=int, default=8)
+    args = parser.parse_args()
+
+    layout = layout_for(args.format)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, pages=40, students_per_page=10, papers=args.papers, pages_per_programme=10)
+        sample = pd.concat(clean_tables(extract_pages(pdf, layout), layout), ignore_index=True)
+
+    # Copies of the sample, each with its own enrollment numbers and names,
+    # like distinct students
+    copies = -(-args.students // len(sample))
+    cleaned = []
+    for k in range(copies):
+        df = sample.copy()
+        df['Enrollment No.'] = df['Enrollment No.'] + f'-{k}'
+        df['Name'] = df['Name'] + f' {k}'
+        cleaned.append(df)
+    students = sum(len(df) for df in cleaned)
+
+    def cleaned_copy():
+        return [df.copy(deep=True).map(lambda v: list(v) if isinstance(v, list) else v) for df in cleaned]
+
+    def compact():
+        results = ResultSet()
+        for df in cleaned:
+            results.add_cleaned(df)
+        return results
+
+    _, df_bytes = measure(cleaned_copy)
+    nested, nested_bytes = measure(lambda: nest_results(cleaned))
+    del nested
+    results, compact_bytes = measure(compact)
+    nested_seconds = timed(lambda: nest_results(cleaned))
+    compact_seconds = timed(compact)
+    boundary_seconds = timed(results.nested)
+
+    print(f"{students} students, {args.papers} papers each")
+    print(f"  {'cleaned DataFrames':20s} {df_bytes / 1e6:8.1f} MB")
+    print(f"  {'nested dict':20s} {nested_bytes / 1e6:8.1f} MB  built in {nested_seconds:.2f}s")
+    print(f"  {'ResultSet':20s} {compact_bytes / 1e6:8.1f} MB  built in {compact_seconds:.2f}s "
+          f"({nested_bytes / compact_bytes:.1f}x smaller than the nested dict)")
+    print(f"  nested() at the boundary: {boundary_seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
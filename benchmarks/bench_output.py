@@ -0,0 +1,91 @@
+# Loading a semester's results into pandas: the nested result.json, flattened
+# to one row per student x paper, against the long table of columnar.py as
+# CSV and, when pyarrow is installed, Parquet.
+#
+#     python benchmarks/bench_output.py --pages 200
+import argparse
+import ast
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import pandas as pd
+
+from columnar import extract_table, pyarrow_available, read_table, write_table
+from records import extract
+from synth import make_gazette
+
+
+def flatten_json(path):
+    # What a consumer of result.json has to do to get the long table
+    with open(path) as f:
+        result = json.load(f)
+    rows = []
+    for batch, programmes in result.items():
+        for programme, sems in programmes.items():
+            for sem, examinations in sems.items():
+                for examination, students in examinations.items():
+                    for student in students:
+                        for paper in student['Papers']:
+                            credits = ast.literal_eval(paper['Credits'])
+                            int_marks = ast.literal_eval(paper['Int_Marks'])
+                            ext_marks = ast.literal_eval(paper['Ext_Marks'])
+                            totals = ast.literal_eval(paper['Total'])
+                            for k, paper_id in enumerate(paper['ID']):
+                                rows.append({
+                                    'Batch': batch, 'Programme Name': programme, 'Sem': sem,
+                                    'Examination': examination, 'Enrollment': student['Enrollment'],
+                                    'Name': student['Name'], 'CGPA': student['CGPA'], 'Paper': paper_id,
+                                    'Credits': credits[k] if k < len(credits) else None,
+                                    'Int_Marks': int_marks[k] if k < len(int_marks) else None,
+                                    'Ext_Marks': ext_marks[k] if k < len(ext_marks) else None,
+                                    'Total': totals[k] if k < len(totals) else None,
+                                })
+    return pd.DataFrame(rows)
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return value, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loading nested JSON and long-table outputs')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--students', type=int, default=5, help='students per page')
+    parser.add_argument('--papers', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, args.pages, args.students, args.papers)
+        table = extract_table(pdf, args.format)
+        print(f"{len(table)} student x paper rows")
+
+        json_path = os.path.join(tmp, 'result.json')
+        with open(json_path, 'w') as f:
+            json.dump(extract(pdf, args.format), f, indent=4)
+        _, load = timed(flatten_json, json_path)
+        print(f"  {'nested json':12s} {os.path.getsize(json_path) / 1e6:7.2f} MB  load {load:7.3f}s")
+
+        outputs = ['csv'] + (['parquet'] if pyarrow_available() else [])
+        for extension in outputs:
+            path = os.path.join(tmp, f'result.{extension}')
+            _, write = timed(write_table, table, path)
+            _, load = timed(read_table, path)
+            print(f"  {extension:12s} {os.path.getsize(path) / 1e6:7.2f} MB  load {load:7.3f}s  write {write:7.3f}s")
+
+
+if __name__ == '__main__':
+    main()
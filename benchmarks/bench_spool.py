@@ -0,0 +1,86 @@
+# Peak RSS of parallel page parsing from an in-memory upload, as the
+# Streamlit app receives it: the PDF bytes sent to every worker (before)
+# against the upload spooled to one temp file that the workers map (after).
+# Each mode runs in a fresh interpreter so the peaks do not mix.
+#
+#     python benchmarks/bench_spool.py --pages 1000 --workers 4
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from engine import iter_parsed, page_chunks
+from records import layout_for
+from spool import spool
+from synth import make_gazette
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS. For
+    # RUSAGE_CHILDREN it is the peak of the largest worker.
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def child(mode, path, fmt, workers, parse_pages):
+    with open(path, 'rb') as f:
+        upload = io.BytesIO(f.read())
+    layout = layout_for(fmt)
+    indices = list(range(parse_pages))
+    rss_before = peak_rss_mb(resource.RUSAGE_SELF)
+
+    start = time.perf_counter()
+    if mode == 'bytes':
+        pages = list(iter_parsed(upload.getvalue(), layout, 'words', workers, indices))
+    else:
+        with spool(upload) as source:
+            pages = list(iter_parsed(source, layout, 'words', workers, indices))
+    print(json.dumps({
+        'pages': len(pages),
+        'seconds': time.perf_counter() - start,
+        'rss_before_mb': rss_before,
+        'parent_mb': peak_rss_mb(resource.RUSAGE_SELF),
+        'worker_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare peak RSS of sending PDF bytes and spooling them')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, default=1000, help='pages in the generated gazette')
+    parser.add_argument('--parse-pages', type=int, default=32,
+                        help='pages actually parsed; the copies cost the same whatever the number')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.format, args.workers, args.parse_pages)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, args.pages)
+        print(f"{os.path.getsize(pdf) / 1e6:.1f} MB PDF, {args.parse_pages} pages parsed by "
+              f"{args.workers} workers in {len(page_chunks(list(range(args.parse_pages)), args.workers))} chunks")
+        for mode, label in (('bytes', 'bytes to workers'), ('spool', 'spooled + mmap')):
+            out = subprocess.run([sys.executable, __file__, '--format', args.format, '--workers', str(args.workers),
+                                  '--parse-pages', str(args.parse_pages), '--child', mode, pdf],
+                                 check=True, capture_output=True, text=True).stdout
+            run = json.loads(out.splitlines()[-1])
+            total = run['parent_mb'] + args.workers * run['worker_mb']
+            print(f"  {label:18s} peak RSS: parent {run['rss_before_mb']:6.0f} -> {run['parent_mb']:6.0f} MB, "
+                  f"largest worker {run['worker_mb']:6.0f} MB, up to {total:6.0f} MB in all  "
+                  f"({run['seconds']:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
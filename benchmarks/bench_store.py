@@ -0,0 +1,86 @@
+# Lookups in store.ResultStore against re-extracting the gazettes. One
+# synthetic gazette is extracted, then stored --gazettes times as distinct
+# gazettes with their own enrollment numbers and batches, and per-student,
+# per-cohort and per-paper queries are timed on the filled store.
+#
+#     python benchmarks/bench_store.py --gazettes 200
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from columnar import extract_table
+from engine import ALL_INSTITUTIONS
+from store import ResultStore
+from synth import make_gazette
+
+
+def best_ms(query, repeat):
+    # (median ms of the query, rows it returned)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(query())
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time result store lookups against re-extraction')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--gazettes', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, 'gazette.pdf')
+        make_gazette(pdf, args.format, pages=args.pages, students_per_page=10, pages_per_programme=10)
+        start = time.perf_counter()
+        sample = extract_table(pdf, args.format, ALL_INSTITUTIONS)
+        extract_seconds = time.perf_counter() - start
+
+        store = ResultStore(os.path.join(tmp, 'results.sqlite'))
+        start = time.perf_counter()
+        for k in range(args.gazettes):
+            # Each copy is another year of the same programmes
+            table = sample.copy()
+            table['Batch'] = table['Batch'] + f'-{k}'
+            table['Enrollment'] = table['Enrollment'] + f'{k:04d}'
+            store.ingest_table(table, f'gazette-{k}', f'gazette-{k}.pdf', args.format)
+        ingest_seconds = time.perf_counter() - start
+        # A gazette that is already stored is not extracted again
+        store.ingest(pdf, args.format)
+        start = time.perf_counter()
+        store.ingest(pdf, args.format)
+        again_ms = (time.perf_counter() - start) * 1000
+        rows = store.conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+        last = sample.iloc[-1]
+        k = args.gazettes // 2
+        queries = {
+            'student': lambda: store.student(last['Enrollment'] + f'{k:04d}'),
+            'cohort': lambda: store.cohort(batch=last['Batch'] + f'-{k}', programme=last['Programme Name'],
+                                           sem=last['Sem']),
+            'paper': lambda: store.query(paper=last['Paper'], batch=last['Batch'] + f'-{k}'),
+        }
+        store.student('warm up')
+
+        print(f"{args.gazettes} gazettes, {rows} paper rows stored in {ingest_seconds:.2f}s "
+              f"({rows / ingest_seconds:.0f} rows/s)")
+        print(f"re-extracting one {args.pages}-page gazette: {extract_seconds * 1000:.0f} ms, "
+              f"all of them: {extract_seconds * args.gazettes:.1f}s")
+        print(f"ingesting a stored gazette again: {again_ms:.1f} ms")
+        for name, query in queries.items():
+            ms, found = best_ms(query, args.repeat)
+            print(f"{name:8s} {ms:8.2f} ms  {found} rows")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Import-time budget of the entry points, measured with `python -X importtime`
+# in a fresh interpreter per module (best of --repeat runs). An entry point
+# fails when it takes longer than its budget or when importing it loads one
+# of the heavy libraries that only an extraction should load. Exits 1 on any
+# failure.
+#
+#     python benchmarks/import_budget.py
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ('pandas', 'numpy', 'pdfplumber', 'fitz', 'pymupdf', 'tabula', 'pyarrow')
+
+# entry point -> (budget in ms, modules not counted against it, heavy
+# modules allowed because those uncounted modules load them)
+BUDGETS = {
+    'engine': (150, (), ()),
+    'layouts': (150, (), ()),
+    'records': (150, (), ()),
+    'result': (150, (), ()),
+    'result2': (150, (), ()),
+    'jobs': (150, (), ()),
+    'cli': (150, (), ()),
+    'store': (150, (), ()),
+    'analytics': (150, (), ()),
+    'scrap': (150, ('streamlit',), ('pandas', 'numpy', 'pyarrow')),
+}
+
+
+def import_time(module, uncounted):
+    # (ms spent importing module, less the uncounted modules it imports;
+    # heavy modules it loaded)
+    code = (f"import {module}, sys; "
+            f"print('heavy:' + ','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    run = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True,
+                         check=True)
+    total = 0
+    for line in run.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.rstrip()
+        if name.strip() == module and name.startswith(' ' + module):
+            total += int(cumulative)
+        elif name.strip() in uncounted:
+            total -= int(cumulative)
+    # PyMuPDF may print a notice of its own on import
+    heavy = []
+    for line in run.stdout.splitlines():
+        if line.startswith('heavy:'):
+            heavy = [name for name in line[len('heavy:'):].split(',') if name]
+    return total / 1000, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of the entry points against a budget')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':10s} {'ms':>8s} {'budget':>8s}  heavy modules loaded")
+    for module, (budget, uncounted, allowed) in BUDGETS.items():
+        if any(importlib.util.find_spec(name) is None for name in uncounted):
+            print(f"{module:10s} {'-':>8s} {budget:8d}  skipped: {', '.join(uncounted)} not installed")
+            continue
+        runs = [import_time(module, uncounted) for _ in range(args.repeat)]
+        ms = min(seconds for seconds, _ in runs)
+        heavy = [name for name in runs[0][1] if name not in allowed]
+        ok = ms <= budget and not heavy
+        failed = failed or not ok
+        print(f"{module:10s} {ms:8.1f} {budget:8d}  {', '.join(heavy) or '-'}{'' if ok else '  FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
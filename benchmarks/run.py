@@ -0,0 +1,128 @@
+# Stage-by-stage benchmark of the extraction pipeline on a synthetic gazette.
+#
+# Runs result.format1 or result2.format2 with with_metrics=True and reports
+# the time of every stage they record (PyMuPDF scan, pdfplumber with its page
+# text extraction, extract_data and table extraction, grouping,
+# cleaning_preprocessing, nesting, JSON write, ...), pages/sec, students/sec
+# and peak RSS. With --save the numbers
+# are written to benchmarks/results/ and compared with the previous saved run
+# of the same configuration.
+#
+#     python benchmarks/run.py --format format1 --pages 200 --target-share 0.2 --save
+import argparse
+import datetime
+import glob
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from engine import PAGE_STAGES
+from result import format1
+from result2 import format2
+from synth import make_gazette
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+ENTRY_POINTS = {'format1': format1, 'format2': format2}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_pipeline(path, fmt, tmp):
+    # The pipeline as users run it; its Metrics hold the stage times
+    _, metrics = ENTRY_POINTS[fmt](path, with_metrics=True, output=os.path.join(tmp, 'result.json'))
+    return metrics
+
+
+def previous_run(config):
+    runs = sorted(glob.glob(os.path.join(RESULTS_DIR, '*.json')))
+    for path in reversed(runs):
+        with open(path) as f:
+            run = json.load(f)
+        if run.get('config') == config:
+            return path, run
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the extraction pipeline')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--students', type=int, default=5, help='students per page')
+    parser.add_argument('--papers', type=int, default=8)
+    parser.add_argument('--target-share', type=float, default=1.0,
+                        help='share of programme runs that belong to the target institution')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pdf', help='benchmark this PDF instead of generating one')
+    parser.add_argument('--save', action='store_true', help='save the run under benchmarks/results/')
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in ('format', 'pages', 'students', 'papers', 'target_share', 'seed', 'pdf')}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp, 'gazette.pdf')
+            make_gazette(path, args.format, args.pages, args.students, args.papers, args.target_share, seed=args.seed)
+
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        metrics = run_pipeline(path, args.format, tmp)
+        total = time.perf_counter() - start
+    page_count = metrics.counters.get('pages_total', 0)
+    students = metrics.counters.get('students', 0)
+
+    run = {
+        'config': config,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'pages': page_count,
+        'students': students,
+        'seconds': total,
+        'stages': metrics.stages,
+        'counters': metrics.counters,
+        'pages_per_sec': page_count / total if total else None,
+        'students_per_sec': students / total if total else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_rss_before_mb': rss_before,
+    }
+
+    print(f"{page_count} pages, {students} students in {total:.2f}s "
+          f"({run['pages_per_sec']:.1f} pages/s, {run['students_per_sec']:.1f} students/s), "
+          f"peak RSS {run['peak_rss_mb']:.0f} MB")
+    # page_text, extract_data and table_extraction are parts of pdfplumber
+    stages = {stage: seconds for stage, seconds in metrics.stages.items() if stage not in PAGE_STAGES}
+    for stage, seconds in sorted(stages.items(), key=lambda item: -item[1]):
+        print(f"  {stage:24s} {seconds:8.3f}s  {100 * seconds / total:5.1f}%")
+        if stage == 'pdfplumber':
+            for part in PAGE_STAGES:
+                if part in metrics.stages:
+                    print(f"    {part:22s} {metrics.stages[part]:8.3f}s  {100 * metrics.stages[part] / total:5.1f}%")
+
+    if args.save:
+        previous_path, previous = previous_run(config)
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.format}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=4)
+        print(f"saved {path}")
+        if previous is not None:
+            print(f"compared with {os.path.basename(previous_path)}:")
+            for stage, seconds in sorted(metrics.stages.items()):
+                before = previous['stages'].get(stage)
+                if before:
+                    print(f"  {stage:24s} {before:8.3f}s -> {seconds:8.3f}s  ({(seconds - before) / before:+.0%})")
+            print(f"  {'total':24s} {previous['seconds']:8.3f}s -> {total:8.3f}s  "
+                  f"({(total - previous['seconds']) / previous['seconds']:+.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# Synthetic result gazettes in the two layouts the extractors understand, built
+# offline with PyMuPDF.
+#
+#   format1: 5-row student blocks keyed on the 'Roll no./Name' column
+#            (enrollment, name, int/ext marks, grades, S.No. + totals)
+#   format2: 6-row student blocks keyed on the unnamed first column
+#            (enrollment, papers, name, grades, marks + S.No., totals)
+#
+#     python benchmarks/synth.py out.pdf --format format2 --pages 100
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from engine import DEFAULT_INSTITUTION
+
+OTHER_INSTITUTIONS = [
+    'MAHARAJA AGRASEN INSTITUTE OF TECHNOLOGY',
+    'GURU TEGH BAHADUR INSTITUTE OF TECHNOLOGY',
+    'DR. AKHILESH DAS GUPTA INSTITUTE OF TECHNOLOGY',
+]
+SEMESTERS = ['FIRST', 'SECOND', 'THIRD', 'FOURTH', 'FIFTH', 'SIXTH', 'SEVENTH', 'EIGHTH']
+
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+FONT_SIZE = 7
+ROW_HEIGHT = 10
+PAPER_WIDTH = 70
+# Long enough to run into the next column in either layout
+LONG_NAME = 'WITH A VERY LONG GIVEN NAME AND AN EVEN LONGER FAMILY NAME'
+# A footer line across the whole page, below the table
+FOOTER = ' '.join(['This result gazette is computer generated; errors and omissions excepted.'] * 3)
+
+
+def header_lines(fmt, programme, sem, batch, institution):
+    if fmt == 'format1':
+        first = (f"Programme Name: {programme} Sem./Year: {sem} SEMESTER Batch: {batch} "
+                 f"Examination: REGULAR DEC {batch}")
+    else:
+        first = (f"Programme Name: {programme} Sem./Year/EU: {sem} SEMESTER Batch: {batch} "
+                 f"Examination: REGULAR DEC {batch} Result Declared Date: 01-02-{int(batch) + 1}")
+    return [first, f"Institution: {institution} CS/Remarks"]
+
+
+def table_columns(fmt, papers):
+    # (x position, header text) of every column
+    paper_x = [170 + PAPER_WIDTH * k for k in range(papers)]
+    remarks_x = 170 + PAPER_WIDTH * papers
+    if fmt == 'format1':
+        return ([(20, 'S.No.'), (80, 'Roll no./Name')] + [(x, f'Paper{k + 1}') for k, x in enumerate(paper_x)]
+                + [(remarks_x, 'CS/Remarks')])
+    return ([(20, '')] + [(x, f'Paper{k + 1}') for k, x in enumerate(paper_x)]
+            + [(remarks_x, 'CS/Remarks'), (remarks_x + PAPER_WIDTH, 'S.No.')])
+
+
+def total_token(rnd, marks):
+    roll = rnd.random()
+    if roll < 0.03:
+        return 'ABS'
+    if roll < 0.06:
+        return f'{marks}*'
+    return str(marks)
+
+
+def student_block(fmt, rnd, serial, enrollment, name, credits):
+    # The rows of one student, as lists of cell texts in column order
+    papers = len(credits)
+    if fmt == 'format1':
+        rows = [[''] * (papers + 3) for _ in range(5)]
+        rows[0][1] = enrollment
+        rows[1][1] = name
+        rows[4][0] = str(serial)
+        first = 2
+    else:
+        rows = [[''] * (papers + 3) for _ in range(6)]
+        rows[0][0] = enrollment
+        rows[2][0] = name
+        rows[4][-1] = str(serial)
+        first = 1
+
+    for k, credit in enumerate(credits):
+        internal, external = rnd.randint(5, 25), rnd.randint(10, 75)
+        total = total_token(rnd, internal + external)
+        column = first + k
+        if fmt == 'format1':
+            rows[0][column] = f'ES{101 + k}({credit})'
+            rows[2][column] = f'{internal} {external}'
+            rows[3][column] = 'A'
+            rows[4][column] = f'{total}(A)'
+        else:
+            rows[1][column] = f'ES{101 + k} ({credit})'
+            rows[3][column] = 'P'
+            rows[4][column] = f'{internal} {external}'
+            rows[5][column] = f'{total} A'
+    return rows
+
+
+def pick_institution(rnd, target_share):
+    if rnd.random() < target_share:
+        return DEFAULT_INSTITUTION
+    return rnd.choice(OTHER_INSTITUTIONS)
+
+
+def make_gazette(path, fmt='format1', pages=10, students_per_page=5, papers=8, target_share=1.0,
+                 pages_per_programme=20, seed=0, long_names=False, footer=False):
+    # Write a gazette of `pages` pages to `path`. Consecutive runs of
+    # pages_per_programme pages share one programme/semester/batch header, and
+    # each run belongs to the target institution with probability
+    # target_share. With long_names the first student of every page has a
+    # name that runs into the next column; with footer every page ends with
+    # a line across the page. Returns the number of target-institution
+    # students.
+    rnd = random.Random(seed)
+    columns = table_columns(fmt, papers)
+    doc = fitz.open()
+    serial = 0
+    target_students = 0
+
+    for page_number in range(pages):
+        if page_number % pages_per_programme == 0:
+            programme = f'BACHELOR OF TECHNOLOGY (BRANCH {page_number // pages_per_programme + 1})'
+            sem = rnd.choice(SEMESTERS)
+            batch = str(rnd.randint(2018, 2023))
+            institution = pick_institution(rnd, target_share)
+            credits = [rnd.choice([2, 3, 4]) for _ in range(papers)]
+
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = 30
+        for line in header_lines(fmt, programme, sem, batch, institution):
+            page.insert_text((20, y), line, fontsize=FONT_SIZE)
+            y += 12
+        y += 16
+        for x, text in columns:
+            if text:
+                page.insert_text((x, y), text, fontsize=FONT_SIZE)
+        y += 12
+
+        for k in range(students_per_page):
+            serial += 1
+            enrollment = f'{serial:04d}{rnd.randint(0, 9999999):07d}'
+            name = f'STUDENT {serial} {LONG_NAME}' if long_names and k == 0 else f'STUDENT {serial} NAME'
+            for row in student_block(fmt, rnd, serial, enrollment, name, credits):
+                for (x, _), text in zip(columns, row):
+                    if text:
+                        page.insert_text((x, y), text, fontsize=FONT_SIZE)
+                y += ROW_HEIGHT
+            if institution == DEFAULT_INSTITUTION:
+                target_students += 1
+        if footer:
+            page.insert_text((20, y + 12), FOOTER, fontsize=FONT_SIZE)
+
+    doc.save(path)
+    doc.close()
+    return target_students
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic result gazette')
+    parser.add_argument('path')
+    parser.add_argument('--format', default='format1', choices=['format1', 'format2'])
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--students', type=int, default=5, help='students per page')
+    parser.add_argument('--papers', type=int, default=8)
+    parser.add_argument('--target-share', type=float, default=1.0,
+                        help='share of programme runs that belong to the target institution')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--long-names', action='store_true', help='one name per page runs into the next column')
+    parser.add_argument('--footer', action='store_true', help='end every page with a line across it')
+    args = parser.parse_args()
+
+    students = make_gazette(args.path, args.format, args.pages, args.students, args.papers, args.target_share,
+                            seed=args.seed, long_names=args.long_names, footer=args.footer)
+    print(f"wrote {args.path}: {args.pages} pages, {students} target-institution students")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Bump whenever a change to the extraction code changes its output, so stale
+# cache entries are never served
+EXTRACTOR_VERSION = '4'
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'RESULT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pdf_result_extraction')
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_source(file_stream):
+    # sha256 of the PDF bytes, read in chunks from a path or a file object
+    digest = hashlib.sha256()
+    if isinstance(file_stream, (str, os.PathLike)):
+        with open(file_stream, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    elif isinstance(file_stream, bytes):
+        digest.update(file_stream)
+    else:
+        file_stream.seek(0)
+        for chunk in iter(lambda: file_stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        file_stream.seek(0)
+    return digest.hexdigest()
+
+
+def result_key(pdf_hash, fmt, *options):
+    # Content address of an extraction: the PDF hash, the format, the
+    # extractor version and any option that changes the output
+    parts = [pdf_hash, fmt, EXTRACTOR_VERSION] + [str(option) for option in options]
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    # Pickled values in one file per key under `directory`. The file mtime is
+    # the last access time; once the directory grows past max_bytes the least
+    # recently used entries are deleted.
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another process since it was read; the value is good
+            pass
+        return value
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, value, evict=True):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see a
+        # partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if evict:
+            self.evict()
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for path, _, _ in list(self.entries()):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
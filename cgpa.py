@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# (minimum marks, grade point), in ascending order of marks. Marks below the
+# first threshold get FAIL_GRADE.
+GRADE_TABLE = ((40, 4), (45, 5), (50, 6), (55, 7), (65, 8), (75, 9), (90, 10))
+FAIL_GRADE = 0
+
+# Marks that are never counted towards the CGPA
+ABSENT_MARKS = ('ABS',)
+
+
+def grade_points(marks, grade_table=GRADE_TABLE, fail_grade=FAIL_GRADE):
+    # Map an array of marks to grade points with a single searchsorted call
+    thresholds = np.array([minimum for minimum, _ in grade_table], dtype=float)
+    points = np.array([fail_grade] + [point for _, point in grade_table])
+    return points[np.searchsorted(thresholds, np.asarray(marks, dtype=float), side='right')]
+
+
+def grade_point(marks, grade_table=GRADE_TABLE, fail_grade=FAIL_GRADE):
+    return int(grade_points([marks], grade_table, fail_grade)[0])
+
+
+def parse_marks(tokens, starred='skip', absent=ABSENT_MARKS):
+    # Turn mark tokens into floats, with NaN for every mark that must not be
+    # counted. Absent marks and anything non-numeric are masked out; starred
+    # marks ('45*') are either skipped or counted without the star.
+    tokens = pd.Series(np.asarray(tokens, dtype=object)).astype(str).str.strip()
+    counted = ~tokens.isin(absent).to_numpy()
+    if starred == 'strip':
+        tokens = tokens.str.replace('*', '', regex=False)
+    elif starred != 'skip':
+        raise ValueError(f"Unknown starred marks policy: {starred}")
+    counted &= tokens.str.fullmatch(r'[+-]?\d+').fillna(False).to_numpy(dtype=bool)
+
+    marks = np.full(len(tokens), np.nan)
+    marks[counted] = tokens[counted].astype(int).to_numpy()
+    return marks
+
+
+def credit_weighted_cgpa(student, marks, credits, students, regular=None,
+                         grade_table=GRADE_TABLE, fail_grade=FAIL_GRADE):
+    # student[k], marks[k] and credits[k] describe one paper; student holds
+    # integer codes in range(students). Papers with a NaN mark or credit are
+    # not counted. Returns one value per student: the CGPA rounded to two
+    # places, 0 when no paper counted, or None where regular is False.
+    student = np.asarray(student, dtype=np.intp)
+    marks = np.asarray(marks, dtype=float)
+    credits = np.asarray(credits, dtype=float)
+
+    counted = ~(np.isnan(marks) | np.isnan(credits))
+    student = student[counted]
+    credits = credits[counted]
+    weighted = credits * grade_points(marks[counted], grade_table, fail_grade)
+
+    weighted_sum = np.bincount(student, weights=weighted, minlength=students)
+    credit_sum = np.bincount(student, weights=credits, minlength=students)
+    cgpa = np.divide(weighted_sum, credit_sum, out=np.zeros(students), where=credit_sum != 0)
+
+    if regular is None:
+        regular = np.ones(students, dtype=bool)
+    # Python's round() keeps the values identical to the per-row computation
+    return [
+        (round(value, 2) if total else 0) if is_regular else None
+        for is_regular, total, value in zip(regular, credit_sum.tolist(), cgpa.tolist())
+    ]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from cgpa import ABSENT_MARKS, credit_weighted_cgpa, parse_marks
+
+
+def student_blocks(df, step):
+    # Reshape the table into (students, step, columns) without touching rows
+    # one at a time. Only complete blocks are kept, like the i + step - 1 <
+    # len(df) check of the row-by-row loop.
+    complete = len(df) - len(df) % step
+    return df.iloc[:complete].to_numpy(dtype=object).reshape(-1, step, len(df.columns))
+
+
+def block_field(df, blocks, offset, column):
+    # The value of `column` in row `offset` of every student block
+    return blocks[:, offset, df.columns.get_loc(column)]
+
+
+def joined_cells(df, step, columns):
+    # For every row of the table, the cells of `columns` joined with spaces,
+    # built column by column instead of row by row. Returns an array of shape
+    # (students, step).
+    complete = len(df) - len(df) % step
+    cells = df.iloc[:complete][columns].fillna('').astype(str)
+    if not len(columns):
+        return np.full((complete // step, step), '', dtype=object)
+    joined = cells.iloc[:, 0]
+    for column in cells.columns[1:]:
+        joined = joined + ' ' + cells[column]
+    return joined.to_numpy(dtype=object).reshape(-1, step)
+
+
+def split_tokens(strings):
+    # Whitespace split of every string, as lists in an object Series
+    return pd.Series(strings, dtype=object).str.split()
+
+
+def explode_tokens(lists):
+    # Flatten a Series of lists into one long Series (index = student) and
+    # the position of every token inside its list
+    long = lists.explode().dropna()
+    position = long.groupby(level=0).cumcount().to_numpy()
+    return long, position
+
+
+def collect(long, index):
+    # Inverse of explode_tokens: gather a long Series back into one list per
+    # student. The tokens of a student are contiguous, so the lists are plain
+    # slices of the flat value list.
+    counts = np.bincount(index.get_indexer(long.index), minlength=len(index))
+    ends = np.cumsum(counts).tolist()
+    starts = [0] + ends[:-1]
+    values = long.tolist()
+    return pd.Series([values[start:end] for start, end in zip(starts, ends)], index=index, dtype=object)
+
+
+def batched_cgpa(marks, marks_position, credits, credits_position, examination, index):
+    # Credit-weighted grade point average for every student in one pass.
+    # marks holds the parsed marks (NaN where a mark does not count) and
+    # credits the credit tokens, both as long Series indexed by student; they
+    # are paired by position, like zip(Total, Credits).
+    totals = pd.DataFrame({'student': marks.index, 'pos': marks_position, 'marks': marks.to_numpy(dtype=float)})
+    credits = pd.DataFrame({'student': credits.index, 'pos': credits_position,
+                            'credits': parse_marks(credits.to_numpy(), absent=())})
+    papers = totals.merge(credits, on=['student', 'pos'], how='left')
+
+    regular = np.asarray(examination, dtype=object) == 'REGULAR'
+    values = credit_weighted_cgpa(index.get_indexer(papers['student']), papers['marks'].to_numpy(),
+                                  papers['credits'].to_numpy(), len(index), regular)
+    return pd.Series(values, index=index)
+
+
+def marks_series(tokens, starred='skip', absent=ABSENT_MARKS):
+    # parse_marks, keeping the student index of a long token Series
+    return pd.Series(parse_marks(tokens.to_numpy(), starred, absent), index=tokens.index)
@@ -0,0 +1,271 @@
+# Batch extraction without the Streamlit UI.
+#
+# Writes one result per PDF into the output directory plus index.json,
+# which lists every output with its format, page and student counts and the
+# batches/programmes/semesters it contains. PDFs whose output is newer than
+# the PDF and was made with the same options (and, with --store, that are
+# already in the store) are skipped.
+#
+#     python cli.py gazettes/ -o out --workers 4
+#     python cli.py 'gazettes/**/*.pdf' -o out --format format2 --institution all
+#     python cli.py gazettes/ -o out --output-format parquet
+#     python cli.py gazettes/ -o out --store results.sqlite
+#     python cli.py huge.pdf -o out --workers 1 --memory-budget 1024
+#
+# JSON outputs hold the nested result; parquet and csv outputs hold the long
+# table of columnar.py, one row per student x paper. With --store every PDF
+# is also ingested into the result store of store.py, from the same
+# extraction as the output.
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import ResultCache, hash_source
+from engine import (ALL_INSTITUTIONS, DEFAULT_INSTITUTION, build_results, extract_pages, institution_matches,
+                    matching_pages, open_document)
+from metrics import collect as collect_metrics
+from records import FORMATS, detect_format, extract, layout_for
+from sinks import JsonSink, write_atomic
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'index.json'
+
+
+def find_pdfs(inputs):
+    # (pdf path, output name without extension) for every directory, glob or
+    # file given.
+    # Files under a directory keep their relative path in the output name.
+    found = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            for path in sorted(glob.glob(os.path.join(item, '**', '*.pdf'), recursive=True)):
+                found.setdefault(os.path.abspath(path), os.path.relpath(path, item))
+        else:
+            for path in sorted(glob.glob(item, recursive=True)) or [item]:
+                found.setdefault(os.path.abspath(path), os.path.basename(path))
+    return [(path, os.path.splitext(name)[0]) for path, name in found.items()]
+
+
+def institution_option(names):
+    # --institution may be given several times; "all" keeps every institution
+    if not names:
+        return DEFAULT_INSTITUTION
+    names = [name.strip().upper() for name in names]
+    if ALL_INSTITUTIONS.upper() in names:
+        return ALL_INSTITUTIONS
+    if len(names) == 1:
+        return names[0]
+    return sorted(set(names))
+
+
+def up_to_date(entry, pdf, output, options):
+    # The previous index entry of this PDF still describes its output
+    return (entry is not None and entry.get('status') == 'done' and entry.get('options') == options
+            and os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(pdf))
+
+
+def contents(result, by_institution):
+    # (Batch, Programme, Sem, Examination, students) rows of a nested result
+    results = result if by_institution else {None: result}
+    rows = []
+    for institution, nested in results.items():
+        for batch, programmes in nested.items():
+            for programme, sems in programmes.items():
+                for sem, examinations in sems.items():
+                    for examination, students in examinations.items():
+                        row = {'Batch': batch, 'Programme Name': programme, 'Sem': sem,
+                               'Examination': examination, 'students': len(students)}
+                        if by_institution:
+                            row = {'Institution': institution, **row}
+                        rows.append(row)
+    return rows
+
+
+def table_contents(df):
+    # contents() of a long table
+    keys = (['Institution'] if df['Institution'].nunique(dropna=False) > 1 else []) + \
+        ['Batch', 'Programme Name', 'Sem', 'Examination']
+    students = df.drop_duplicates(keys + ['Enrollment', 'Name'])
+    counts = students.groupby(keys, sort=False, dropna=False).size().rename('students').reset_index()
+    return counts.astype(object).where(counts.notna(), None).to_dict('records')
+
+
+def process(pdf, output, fmt, institution, page_workers, use_cache, indent, store_path=None, memory_budget=None):
+    # Extract one PDF into `output`; runs in a worker process
+    start = time.perf_counter()
+    # With 'auto' every page is parsed in its own layout; the index records
+    # the layout of the first result page
+    detected = detect_format(pdf) if fmt == 'auto' else fmt
+    if isinstance(institution, list):
+        institution = frozenset(institution)
+    with collect_metrics() as metrics:
+        stored_table = None
+        if store_path is not None:
+            from columnar import pages_table
+            from store import ResultStore
+
+            pdf_hash = hash_source(pdf)
+            with ResultStore(store_path) as store:
+                stale = not store.up_to_date(pdf_hash)
+            if stale:
+                # One extraction of every institution gives both the stored
+                # table and the output
+                layout = layout_for(fmt)
+                all_pages = extract_pages(pdf, layout, ALL_INSTITUTIONS, workers=page_workers,
+                                          memory_budget=memory_budget)
+                stored_table = pages_table(all_pages, layout)
+
+        if output.endswith('.json'):
+            if stored_table is None:
+                result = extract(pdf, fmt, institution, workers=page_workers,
+                                 cache=ResultCache() if use_cache else None, memory_budget=memory_budget)
+            else:
+                result = build_results(matching_pages(all_pages, institution), layout, institution)
+            JsonSink(output, indent=indent).write(result)
+            by_institution = not isinstance(institution, str) or institution == ALL_INSTITUTIONS
+            rows = contents(result, by_institution)
+        else:
+            from columnar import extract_table, write_table
+
+            if stored_table is None:
+                table = extract_table(pdf, fmt, institution, workers=page_workers, memory_budget=memory_budget)
+            else:
+                wanted = stored_table['Institution'].map(lambda name: institution_matches(name, institution))
+                table = stored_table[wanted.to_numpy(dtype=bool)].reset_index(drop=True)
+            write_atomic(output, lambda tmp_path: write_table(table, tmp_path))
+            rows = table_contents(table)
+
+    if stored_table is not None:
+        with ResultStore(store_path) as store:
+            store.ingest_table(stored_table, pdf_hash, os.path.basename(pdf), fmt)
+
+    pages = metrics.counters.get('pages_total')
+    if pages is None:
+        # Served from the result cache, nothing was scanned
+        with open_document(pdf) as doc:
+            pages = doc.page_count
+
+    return {
+        'format': detected,
+        'pages': pages,
+        'students': sum(row['students'] for row in rows),
+        'seconds': time.perf_counter() - start,
+        # Of the worker process and, with --page-workers, its page workers
+        'peak_rss_mb': max(metrics.memory.values(), default=None),
+        'contents': rows,
+    }
+
+
+def load_index(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {entry['pdf']: entry for entry in json.load(f)['files']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract results from a batch of gazette PDFs')
+    parser.add_argument('inputs', nargs='+', help='PDF files, directories or glob patterns')
+    parser.add_argument('-o', '--output', default='results', help='output directory (default: results)')
+    parser.add_argument('--format', default='auto', choices=['auto'] + sorted(FORMATS),
+                        help='result layout; auto detects it page by page (default: auto)')
+    parser.add_argument('--output-format', default='json', choices=['json', 'parquet', 'csv'],
+                        help='nested JSON, or the long table as parquet or csv (default: json)')
+    parser.add_argument('--compact', action='store_true', help='write JSON without indentation')
+    parser.add_argument('--institution', action='append',
+                        help='institution to extract; repeat for several, or "all" (default: %s)' % DEFAULT_INSTITUTION)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='PDFs processed at once')
+    parser.add_argument('--page-workers', type=int, default=1, help='worker processes per PDF')
+    parser.add_argument('--no-cache', action='store_true', help='do not use the result cache (JSON output only)')
+    parser.add_argument('--force', action='store_true', help='reprocess PDFs whose output is up to date')
+    parser.add_argument('--store', metavar='DB', help='also ingest every processed PDF into this result store')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='resident memory to keep each PDF worker near; pages are parsed in windows under it')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    pdfs = find_pdfs(args.inputs)
+    if not pdfs:
+        parser.error('no PDFs found')
+    from columnar import pyarrow_available
+
+    if args.output_format == 'parquet' and not pyarrow_available():
+        parser.error('parquet output needs pyarrow; use --output-format csv')
+
+    institution = institution_option(args.institution)
+    options = {'format': args.format, 'institution': institution, 'output_format': args.output_format}
+    if args.store:
+        options['store'] = os.path.abspath(args.store)
+    index_path = os.path.join(args.output, INDEX_NAME)
+    previous = load_index(index_path)
+
+    store = None
+    if args.store:
+        from store import ResultStore
+
+        store = ResultStore(args.store)
+    entries = {}
+    todo = []
+    for pdf, name in pdfs:
+        output = os.path.join(args.output, f'{name}.{args.output_format}')
+        # With --store, a fresh output whose gazette is not stored yet is
+        # processed again, which ingests it
+        if (not args.force and up_to_date(previous.get(pdf), pdf, output, options)
+                and (store is None or store.up_to_date(hash_source(pdf)))):
+            entries[pdf] = previous[pdf]
+            logger.info("up to date: %s", pdf)
+        else:
+            todo.append((pdf, output))
+    if store is not None:
+        store.close()
+
+    start = time.perf_counter()
+    processed = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(todo) or 1))) as pool:
+        futures = {
+            pool.submit(process, pdf, output, args.format, institution, args.page_workers, not args.no_cache,
+                        not args.compact, args.store, args.memory_budget): (pdf, output)
+            for pdf, output in todo
+        }
+        for future in as_completed(futures):
+            pdf, output = futures[future]
+            entry = {'pdf': pdf, 'output': os.path.relpath(output, args.output), 'options': options}
+            try:
+                entry.update(future.result(), status='done')
+                processed.append(entry)
+                logger.info("%s: %s pages, %s students in %.1fs, peak RSS %s MB", pdf, entry['pages'],
+                            entry['students'], entry['seconds'], entry['peak_rss_mb'] and round(entry['peak_rss_mb']))
+            except Exception as e:
+                entry.update(status='failed', error=f'{type(e).__name__}: {e}')
+                failed += 1
+                logger.error("%s failed: %s", pdf, entry['error'])
+            entries[pdf] = entry
+    elapsed = time.perf_counter() - start
+
+    # Earlier runs into the same directory stay in the index
+    files = [entries[pdf] for pdf, _ in pdfs if pdf in entries]
+    files += [entry for pdf, entry in previous.items() if pdf not in entries]
+    JsonSink(index_path).write({'files': files})
+
+    pages = sum(entry['pages'] for entry in processed)
+    students = sum(entry['students'] for entry in processed)
+    print(f"{len(processed)} processed, {len(pdfs) - len(todo)} up to date, {failed} failed")
+    if processed:
+        print(f"{pages} pages, {students} students in {elapsed:.1f}s "
+              f"({pages / elapsed:.1f} pages/s, {students / elapsed:.1f} students/s)")
+        peaks = [entry['peak_rss_mb'] for entry in processed if entry['peak_rss_mb'] is not None]
+        if peaks:
+            print(f"peak RSS of a PDF worker: {max(peaks):.0f} MB")
+    print(f"index: {index_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
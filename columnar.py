@@ -0,0 +1,153 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+from engine import DEFAULT_INSTITUTION, clean_tables, extract_pages, split_by_institution
+from metrics import current as current_metrics
+from records import layout_for
+
+# Long-format results: one row per student x paper with typed marks, instead
+# of the nested dict with stringified lists per student. Loads straight into
+# pandas; the nested form is derived from it with nest_table when needed.
+
+STUDENT_COLUMNS = ['Institution', 'Batch', 'Programme Name', 'Sem', 'Examination', 'Enrollment', 'Name', 'CGPA']
+PAPER_COLUMNS = ['Paper', 'Credits', 'Int_Marks', 'Ext_Marks', 'Total', 'Total_Raw', 'Counts_For_CGPA']
+TABLE_COLUMNS = STUDENT_COLUMNS + PAPER_COLUMNS
+TABLE_DTYPES = {
+    'Institution': 'str', 'Batch': 'str', 'Programme Name': 'str', 'Sem': 'str', 'Examination': 'str',
+    'Enrollment': 'str', 'Name': 'str', 'CGPA': 'float64', 'Paper': 'str', 'Credits': 'Int64',
+    'Int_Marks': 'Int64', 'Ext_Marks': 'Int64', 'Total': 'Int64', 'Total_Raw': 'str',
+    'Counts_For_CGPA': 'boolean',
+}
+NEST_KEYS = ['Batch', 'Programme Name', 'Sem', 'Examination']
+
+# Cleaned-table column -> long-table column
+RENAMES = {'Programme_Name': 'Programme Name', 'Enrollment No.': 'Enrollment'}
+
+
+def pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def empty_table():
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in TABLE_DTYPES.items()})
+
+
+def to_int(tokens):
+    # '45' -> 45; 'ABS', '' and missing -> <NA>
+    return pd.to_numeric(pd.Series(tokens, dtype=object), errors='coerce').astype('Int64')
+
+
+def paper_tokens(lists, name):
+    # (student, position, token) rows of a Series of per-student lists
+    long = lists.explode().dropna()
+    return pd.DataFrame({
+        'student': long.index,
+        'position': long.groupby(level=0).cumcount().to_numpy(),
+        name: long.astype(str).to_numpy(),
+    })
+
+
+def long_table(cleaned_df, institution=None):
+    # One row per paper of every student in a cleaned table. Papers are
+    # paired with their credits, marks and total by position; a student
+    # without papers keeps one row with an empty Paper. Totals come from
+    # Paper_Totals, which keeps ABS in place, not from Total; Counts_For_CGPA
+    # tells whether the layout counts the paper in the semester CGPA.
+    students = cleaned_df.reset_index(drop=True)
+    papers = students['PaperID'].explode()
+    frame = pd.DataFrame({
+        'student': papers.index,
+        'position': papers.groupby(level=0).cumcount().to_numpy(),
+        'Paper': papers.to_numpy(),
+    })
+    for column, name in (('Credits', 'Credits'), ('Int_Marks', 'Int_Marks'), ('Ext_Marks', 'Ext_Marks'),
+                         ('Paper_Totals', 'Total_Raw'), ('Paper_Counted', 'Counts_For_CGPA')):
+        frame = frame.merge(paper_tokens(students[column], name), how='left', on=['student', 'position'])
+
+    table = students.rename(columns=RENAMES).iloc[frame['student'].to_numpy()].reset_index(drop=True)
+    table['Institution'] = institution
+    for column in ('Paper', 'Total_Raw'):
+        table[column] = frame[column].to_numpy()
+    for column in ('Credits', 'Int_Marks', 'Ext_Marks'):
+        table[column] = to_int(frame[column].to_numpy())
+    table['Total'] = to_int(frame['Total_Raw'].str.rstrip('*').to_numpy())
+    table['Counts_For_CGPA'] = frame['Counts_For_CGPA'].map({'True': True, 'False': False}).to_numpy()
+    return table[TABLE_COLUMNS].astype(TABLE_DTYPES)
+
+
+def extract_table(file_stream, fmt='auto', institution=DEFAULT_INSTITUTION, table_backend='words', workers=1,
+                  page_cache=None, prefilter=True, memory_budget=None):
+    # The long table of one institution, several, or ALL_INSTITUTIONS
+    layout = layout_for(fmt)
+    pages = extract_pages(file_stream, layout, institution=institution, table_backend=table_backend, workers=workers,
+                          page_cache=page_cache, prefilter=prefilter, memory_budget=memory_budget)
+    return pages_table(pages, layout)
+
+
+def pages_table(pages, layout):
+    # The long table of extracted pages (engine.extract_pages)
+    frames = []
+    for name, bucket in split_by_institution(pages).items():
+        cleaned_result_dfs = clean_tables(bucket, layout)
+        with current_metrics().stage('long_table'):
+            frames += [long_table(df, name) for df in cleaned_result_dfs]
+    if not frames:
+        return empty_table()
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_table(df, path):
+    # Parquet, Arrow/Feather or CSV, by file extension
+    extension = os.path.splitext(path)[1].lower()
+    with current_metrics().stage('table_write'):
+        if extension == '.parquet':
+            df.to_parquet(path, index=False)
+        elif extension in ('.arrow', '.feather'):
+            df.to_feather(path)
+        elif extension == '.csv':
+            df.to_csv(path, index=False)
+        else:
+            raise ValueError(f"Unknown table format: {path}")
+
+
+def read_table(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return pd.read_parquet(path)
+    if extension in ('.arrow', '.feather'):
+        return pd.read_feather(path)
+    if extension == '.csv':
+        return pd.read_csv(path, dtype=TABLE_DTYPES, keep_default_na=False, na_values=[''])
+    raise ValueError(f"Unknown table format: {path}")
+
+
+def plain(value):
+    # JSON-friendly scalar: <NA> and NaN -> None, numpy ints -> int
+    if value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def nest_table(df, by_institution=False):
+    # Batch -> Programme -> Sem -> Examination -> students, each student
+    # with one typed entry per paper. With by_institution, one such result
+    # per institution.
+    if by_institution:
+        return {institution: nest_table(group) for institution, group in df.groupby('Institution', sort=False, dropna=False)}
+
+    result = {}
+    student = None
+    previous = None
+    for row in df[NEST_KEYS + ['Enrollment', 'Name', 'CGPA'] + PAPER_COLUMNS].itertuples(index=False, name=None):
+        row = [plain(value) for value in row]
+        batch, programme_name, sem, examination, enrollment, name, cgpa = row[:7]
+        if (batch, programme_name, sem, examination, enrollment, name) != previous:
+            previous = (batch, programme_name, sem, examination, enrollment, name)
+            student = {'Enrollment': enrollment, 'Name': name, 'CGPA': cgpa, 'Papers': []}
+            (result.setdefault(batch, {}).setdefault(programme_name, {}).setdefault(sem, {})
+             .setdefault(examination, []).append(student))
+        if row[7] is not None:
+            student['Papers'].append(dict(zip(['ID'] + PAPER_COLUMNS[1:], row[7:])))
+    return result
@@ -0,0 +1,823 @@
+import hashlib
+import io
+import logging
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import tabula_pool
+from cache import hash_source, result_key
+from memory import PageWindow, peak_rss_mb
+from metrics import collect as collect_metrics, current as current_metrics
+from spool import map_file, spool
+
+# pandas, pdfplumber and PyMuPDF are imported by the functions that use them,
+# so importing this module, or an entry point built on it, stays cheap until
+# an extraction runs (warmup.py can load them ahead of time)
+
+logger = logging.getLogger(__name__)
+
+# Words whose tops are within this many points belong to the same text line
+LINE_TOLERANCE = 3
+# Horizontal gap (in points) that separates two table columns
+COLUMN_GAP = 5
+
+DEFAULT_INSTITUTION = 'BHAGWAN PARSHURAM INSTITUTE OF TECHNOLOGY'
+# Pass as `institution` to keep the pages of every institution
+ALL_INSTITUTIONS = 'all'
+# Metrics stages of parse_page; page workers send their times back
+PAGE_STAGES = ('page_text', 'extract_data', 'table_extraction')
+
+
+def group_lines(words, tolerance=LINE_TOLERANCE):
+    # Cluster the page words into text lines, top to bottom and left to right
+    lines = []
+    current = []
+    current_top = None
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        if current and abs(word['top'] - current_top) > tolerance:
+            lines.append(sorted(current, key=lambda w: w['x0']))
+            current = []
+        if not current:
+            current_top = word['top']
+        current.append(word)
+    if current:
+        lines.append(sorted(current, key=lambda w: w['x0']))
+    return lines
+
+
+def lines_to_text(lines):
+    return '\n'.join(' '.join(word['text'] for word in line) for line in lines)
+
+
+def find_header_line(lines, anchor):
+    for idx, line in enumerate(lines):
+        if anchor in ' '.join(word['text'] for word in line):
+            return idx
+    return None
+
+
+def column_spans(lines, gap=COLUMN_GAP, spans=()):
+    # Merge the x-extents of every word, and of any spans found before, into
+    # column intervals, the same way a stream-mode table reader guesses
+    # columns from text alignment
+    extents = sorted([tuple(span) for span in spans] + [(word['x0'], word['x1']) for line in lines for word in line])
+    merged = []
+    for x0, x1 in extents:
+        if merged and x0 - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], x1)
+        else:
+            merged.append([x0, x1])
+    return merged
+
+
+def fitted_spans(table_lines, gap=COLUMN_GAP):
+    # (column spans, whether each line fits them). The columns start from
+    # the header line and grow with every row below it that does not join
+    # two of them; a row that would, such as a name running into the next
+    # column or a footer across the page, is left out of the spans.
+    spans = column_spans(table_lines[:1], gap)
+    fits = [True]
+    for line in table_lines[1:]:
+        grown = column_spans([line], gap, spans)
+        # Every column found so far still lies within a column of its own
+        fits.append(all(sum(1 for x0, x1 in spans if start <= x0 and x1 <= end) <= 1 for start, end in grown))
+        if fits[-1]:
+            spans = grown
+    return spans, fits
+
+
+def column_names(header_cells):
+    # Name the columns like pandas does when reading a CSV header
+    names = []
+    seen = {}
+    for idx, cell in enumerate(header_cells):
+        name = cell if cell else f'Unnamed: {idx}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def split_cells(line, spans):
+    cells = [[] for _ in spans]
+    for word in line:
+        centre = (word['x0'] + word['x1']) / 2
+        for idx, (x0, x1) in enumerate(spans):
+            if centre <= x1 or idx == len(spans) - 1:
+                cells[idx].append(word['text'])
+                break
+    return [' '.join(cell) if cell else None for cell in cells]
+
+
+def split_phrases(line, spans, gap=COLUMN_GAP):
+    # Cells of a line that does not fit the columns: runs of words closer
+    # than gap stay together, in the column where they start
+    phrases = []
+    for word in line:
+        if phrases and word['x0'] - phrases[-1][-1]['x1'] <= gap:
+            phrases[-1].append(word)
+        else:
+            phrases.append([word])
+    cells = [[] for _ in spans]
+    for phrase in phrases:
+        x0 = phrase[0]['x0']
+        idx = next((idx for idx, span in enumerate(spans) if x0 <= span[1]), len(spans) - 1)
+        cells[idx] += [word['text'] for word in phrase]
+    return [' '.join(cell) if cell else None for cell in cells]
+
+
+def lines_to_table(lines, anchor, gap=COLUMN_GAP):
+    # Build the result table from the lines below the header row, down to
+    # the last one that fits the columns
+    header_idx = find_header_line(lines, anchor)
+    if header_idx is None:
+        return None
+    table_lines = lines[header_idx:]
+    spans, fits = fitted_spans(table_lines, gap)
+    last = max(idx for idx, fit in enumerate(fits) if fit)
+    header = split_cells(table_lines[0], spans)
+    rows = [split_cells(line, spans) if fit else split_phrases(line, spans, gap)
+            for line, fit in zip(table_lines[1:last + 1], fits[1:])]
+    import pandas as pd
+
+    return pd.DataFrame(rows, columns=column_names(header))
+
+
+def read_page(page, layout):
+    # Parse the page once and derive both the header text and the table from
+    # the same word boxes
+    metrics = current_metrics()
+    with metrics.stage('page_text'):
+        lines = group_lines(page.extract_words())
+        text = lines_to_text(lines)
+    with metrics.stage('table_extraction'):
+        table = lines_to_table(lines, layout['header_anchor'])
+    return text, table
+
+
+def page_layout(layout, metadata):
+    # The layout a page is in: a mixed-format layout picks one of its
+    # 'layouts' from the page header, any other layout is its own
+    return layout.get('layouts', {}).get(metadata.get('Layout'), layout)
+
+
+def parse_page(page, layout, table_backend):
+    # Header metadata and result table of one page, whatever its institution.
+    # The PAGE_STAGES are timed inside the 'pdfplumber' time of the page.
+    if table_backend == 'words':
+        text, table = read_page(page, layout)
+    else:
+        with current_metrics().stage('page_text'):
+            text, table = page.extract_text(), None
+    with current_metrics().stage('extract_data'):
+        metadata = layout['extract_data'](text)
+    if table is not None and page_layout(layout, metadata)['key_column'] not in table.columns:
+        table = None
+    return metadata, table
+
+
+def institution_matches(name, institution):
+    # `institution` is one name, a collection of names, ALL_INSTITUTIONS, or
+    # None for no filtering at all
+    if institution is None:
+        return True
+    if institution == ALL_INSTITUTIONS:
+        return name is not None
+    if isinstance(institution, str):
+        return name == institution
+    return name in institution
+
+
+def page_record(index, metadata, table, institution, seconds=0.0, cached=False, layout=None):
+    # Check if Institution matches the required value. With layout, a
+    # matching page without a result table is reported.
+    matched = institution_matches(metadata.get('Institution'), institution)
+    metrics = current_metrics()
+    metrics.page(index + 1, seconds, matched, cached)
+    metrics.count('pages_matched' if matched else 'pages_other_institution')
+    logger.debug("page %d: %s", index + 1, 'matched' if matched else 'skipped')
+    if not matched:
+        return None
+    if table is None and layout is not None:
+        logger.warning("page %d: no '%s' column found below the header row; the page has no students",
+                       index + 1, page_layout(layout, metadata)['key_column'])
+        metrics.count('pages_no_key_column')
+    return {'page': index + 1, 'metadata': metadata, 'tables': [] if table is None else [table]}
+
+
+def open_source(source):
+    # What pdfplumber reads: the PDF bytes, or a read-only mapping of the
+    # file at path `source`
+    return io.BytesIO(source) if isinstance(source, bytes) else map_file(source)
+
+
+def page_chunks(indices, workers, chunks_per_worker=4):
+    # Split the pages into contiguous chunks, a few per worker so a slow
+    # chunk does not hold up the whole pool
+    if not indices:
+        return []
+    chunks = max(1, min(len(indices), workers * chunks_per_worker))
+    size = -(-len(indices) // chunks)
+    return [indices[start:start + size] for start in range(0, len(indices), size)]
+
+
+def timed_parse(page, index, layout, table_backend, institution):
+    # (index, metadata, table, seconds) of one page. The table of a page of
+    # an institution not asked for is dropped straight away.
+    start = time.perf_counter()
+    try:
+        metadata, table = parse_page(page, layout, table_backend)
+    finally:
+        # Drop the page's chars, layout objects and text map now rather than
+        # when the whole document is closed
+        page.close()
+    if not institution_matches(metadata.get('Institution'), institution):
+        table = None
+    return index, metadata, table, time.perf_counter() - start
+
+
+def page_count(source):
+    with open_document(source) as doc:
+        return doc.page_count
+
+
+def page_runs(indices):
+    # [first, last] of every run of consecutive page indices
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+
+def window_pdf(doc, indices):
+    # The given pages of a PyMuPDF document copied into a PDF of their own,
+    # without links and annotations, which no layout reads
+    import fitz  # PyMuPDF
+
+    with fitz.open() as part:
+        for first, last in page_runs(indices):
+            part.insert_pdf(doc, from_page=first, to_page=last, links=False, annots=False)
+        return part.tobytes()
+
+
+def iter_windows(source, layout, indices, table_backend, institution, memory_budget):
+    # Parse the pages one window at a time. Each window is copied into a PDF
+    # of its own, so pdfminer only ever walks and caches that window, and is
+    # sized to keep resident memory under memory_budget MB
+    # (memory.PageWindow).
+    import pdfplumber
+
+    window = PageWindow(memory_budget)
+    position = 0
+    with open_document(source) as doc:
+        if indices is None:
+            indices = list(range(doc.page_count))
+        while position < len(indices):
+            chunk = indices[position:position + window.size]
+            window.start()
+            with pdfplumber.open(io.BytesIO(window_pdf(doc, chunk))) as pdf:
+                for i, page in zip(chunk, pdf.pages):
+                    yield timed_parse(page, i, layout, table_backend, institution)
+                window.finish(len(chunk))
+            current_metrics().count('page_windows')
+            position += len(chunk)
+
+
+def parse_range(source, layout, indices, table_backend, institution=None, memory_budget=None):
+    # Worker entry point: parse the given pages. Returns them with the peak
+    # resident memory of the worker and the seconds spent in PAGE_STAGES.
+    import pdfplumber
+
+    with collect_metrics() as metrics:
+        if memory_budget is not None:
+            parsed = list(iter_windows(source, layout, indices, table_backend, institution, memory_budget))
+        else:
+            with open_source(source) as stream, pdfplumber.open(stream) as pdf:
+                parsed = [timed_parse(pdf.pages[i], i, layout, table_backend, institution) for i in indices]
+    stages = {name: seconds for name, seconds in metrics.stages.items() if name in PAGE_STAGES}
+    return parsed, peak_rss_mb(), stages
+
+
+def iter_parsed(source, layout, table_backend, workers=1, indices=None, institution=None, memory_budget=None):
+    # (index, metadata, table, seconds) for the requested pages, in page
+    # order. With memory_budget (MB) the pages are parsed in windows that
+    # keep each process under it; worker processes share the budget.
+    import pdfplumber
+
+    if workers > 1:
+        if indices is None:
+            indices = list(range(page_count(source)))
+        worker_budget = None if memory_budget is None else memory_budget / workers
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(parse_range, source, layout, chunk, table_backend, institution, worker_budget)
+                for chunk in page_chunks(indices, workers)
+            ]
+            # Chunks are submitted in page order, so collecting the futures in
+            # submission order keeps the merged pages in document order
+            for future in futures:
+                parsed, peak, stages = future.result()
+                current_metrics().peak('worker_peak_rss_mb', peak)
+                for name, seconds in stages.items():
+                    current_metrics().add_time(name, seconds)
+                yield from parsed
+        return
+
+    if memory_budget is not None:
+        yield from iter_windows(source, layout, indices, table_backend, institution, memory_budget)
+        return
+
+    with open_source(source) as stream, pdfplumber.open(stream) as pdf:
+        for i in range(len(pdf.pages)) if indices is None else indices:
+            yield timed_parse(pdf.pages[i], i, layout, table_backend, institution)
+
+
+# An indirect reference inside a PDF object's source, e.g. '12 0 R'
+REFERENCE = re.compile(r'(\d+) \d+ R')
+
+
+def page_resources(doc, page):
+    # Source of the page's /Resources, which may be inherited from the page
+    # tree above it
+    xref = page.xref
+    while xref:
+        kind, value = doc.xref_get_key(xref, 'Resources')
+        if kind != 'null':
+            return value
+        kind, parent = doc.xref_get_key(xref, 'Parent')
+        xref = int(parent.split()[0]) if kind == 'xref' else 0
+    return ''
+
+
+def page_fingerprint(page, streams=None):
+    # Hash of the page content stream, geometry and every object its
+    # resources reach (forms, fonts, images, ...), so pages drawn through
+    # XObjects with identical content streams still differ. References are
+    # numbered in the order they are met, so a reissued PDF with renumbered
+    # objects keeps the fingerprint of every page that was not edited.
+    # streams memoizes the digest of every stream xref across the pages of
+    # one document.
+    doc = page.parent
+    streams = {} if streams is None else streams
+    digest = hashlib.sha256(page.read_contents())
+    digest.update(repr((tuple(page.rect), page.rotation)).encode())
+
+    seen = {}
+    pending = []
+
+    def number(match):
+        xref = int(match.group(1))
+        if xref not in seen:
+            seen[xref] = len(seen)
+            pending.append(xref)
+        return f'@{seen[xref]}'
+
+    digest.update(REFERENCE.sub(number, page_resources(doc, page)).encode())
+    while pending:
+        xref = pending.pop()
+        digest.update(REFERENCE.sub(number, doc.xref_object(xref, compressed=True)).encode())
+        if doc.xref_is_stream(xref):
+            if xref not in streams:
+                streams[xref] = hashlib.sha256(doc.xref_stream_raw(xref)).digest()
+            digest.update(streams[xref])
+    return digest.hexdigest()
+
+
+def open_document(source):
+    import fitz  # PyMuPDF
+
+    return fitz.open(stream=source, filetype='pdf') if isinstance(source, bytes) else fitz.open(source)
+
+
+def normalize_text(text):
+    return ' '.join(text.split()).upper()
+
+
+def candidate_pages(doc, institution):
+    # Cheap first pass over PyMuPDF's raw page text: the pages that mention
+    # the institution (or any of the institutions) at all. Only these get
+    # pdfplumber's layout analysis.
+    if institution is None or institution == ALL_INSTITUTIONS:
+        return list(range(doc.page_count))
+    names = [institution] if isinstance(institution, str) else institution
+    needles = [normalize_text(name) for name in names]
+    candidates = []
+    for page in doc:
+        text = normalize_text(page.get_text())
+        if any(needle in text for needle in needles):
+            candidates.append(page.number)
+    return candidates
+
+
+def scan_document(source, institution, prefilter, fingerprints=False):
+    # One PyMuPDF pass over the document: the page indices worth parsing and,
+    # if asked for, their fingerprints
+    metrics = current_metrics()
+    with metrics.stage('pymupdf_scan'), open_document(source) as doc:
+        indices = candidate_pages(doc, institution) if prefilter else list(range(doc.page_count))
+        metrics.count('pages_total', doc.page_count)
+        metrics.count('pages_prefiltered_out', doc.page_count - len(indices))
+        if not fingerprints:
+            return indices, None
+        streams = {}
+        return indices, [page_fingerprint(doc[i], streams) for i in indices]
+
+
+def iter_cached_pages(source, layout, institution, table_backend, workers, page_cache, prefilter, memory_budget=None):
+    # Reuse the parsed metadata and table of every page whose fingerprint is
+    # already in page_cache; only the other pages go through pdfplumber
+    indices, fingerprints = scan_document(source, institution, prefilter, fingerprints=True)
+    keys = [result_key(fingerprint, layout['name'], 'page', table_backend) for fingerprint in fingerprints]
+    misses = [index for index, key in zip(indices, keys) if not page_cache.contains(key)]
+    parsed = iter_parsed(source, layout, table_backend, workers, indices=misses, memory_budget=memory_budget)
+    misses = set(misses)
+
+    metrics = current_metrics()
+    for index, key in zip(indices, keys):
+        cached = None if index in misses else page_cache.get(key)
+        if cached is None:
+            if index in misses:
+                _, metadata, table, seconds = next(parsed)
+            else:
+                # Evicted since the lookup above
+                _, metadata, table, seconds = next(iter_parsed(source, layout, table_backend, indices=[index]))
+            metrics.add_time('pdfplumber', seconds)
+            page_cache.put(key, {'metadata': metadata, 'table': table}, evict=False)
+        else:
+            metadata, table, seconds = cached['metadata'], cached['table'], 0.0
+            metrics.count('pages_from_page_cache')
+
+        page = page_record(index, metadata, table, institution, seconds, cached=cached is not None,
+                           layout=layout if table_backend == 'words' else None)
+        if page is not None:
+            yield page
+
+    page_cache.evict()
+
+
+def iter_pages(file_stream, layout, institution=DEFAULT_INSTITUTION, table_backend='words', workers=1, page_cache=None,
+               prefilter=True, memory_budget=None):
+    # Yield each matching page as soon as it has been processed. With
+    # prefilter, pages that never mention the institution are skipped
+    # before any layout analysis. With memory_budget (MB of resident memory)
+    # the pages are parsed in windows sized to stay under it.
+    with spool(file_stream) as source:
+        if page_cache is not None:
+            yield from iter_cached_pages(source, layout, institution, table_backend, workers, page_cache, prefilter,
+                                         memory_budget)
+            return
+
+        indices = None
+        if prefilter:
+            indices, _ = scan_document(source, institution, prefilter)
+        metrics = current_metrics()
+        for index, metadata, table, seconds in iter_parsed(source, layout, table_backend, workers, indices,
+                                                           institution, memory_budget):
+            metrics.add_time('pdfplumber', seconds)
+            page = page_record(index, metadata, table, institution, seconds,
+                               layout=layout if table_backend == 'words' else None)
+            if page is not None:
+                yield page
+
+
+def extract_pages(file_stream, layout, institution=DEFAULT_INSTITUTION, table_backend='words', workers=1, page_cache=None,
+                  prefilter=True, memory_budget=None):
+    # Uploads are spooled once here; the page parsers and tabula share the file
+    with spool(file_stream) as source:
+        pages = list(iter_pages(source, layout, institution, table_backend, workers, page_cache, prefilter,
+                                memory_budget))
+
+        if table_backend == 'tabula' and pages:
+            with current_metrics().stage('tabula'):
+                attach_tabula_tables(source, pages, layout)
+
+    return pages
+
+
+def attach_tabula_tables(file_stream, pages, layout):
+    # Legacy path: tabula over the matching pages, read page by page so every
+    # table is attached to the page it came from; a page with no table or
+    # with two no longer shifts the tables of the pages after it. The reads
+    # go to a resident JVM from tabula_pool when one is available.
+    tables = tabula_pool.read_pages(file_stream, [p['page'] for p in pages], **layout.get('tabula_options', {}))
+    for page, page_tables in zip(pages, tables):
+        key_column = page_layout(layout, page['metadata'])['key_column']
+        page['tables'] += [table for table in page_tables if key_column in table.columns]
+
+
+def block_alignment(carry, table, layout):
+    # (rows to drop from the end of what came before, rows to drop from the
+    # start of table) so that table continues the student blocks before it.
+    # carry is the number of rows of the unfinished block before the table.
+    # Blocks are located by the S.No. cell, which only the
+    # layout['rows']['serial'] row of a block holds; a table without one is
+    # taken as it is.
+    if 'S.No.' not in table.columns:
+        return 0, 0
+    filled = table['S.No.'].notna().to_numpy().nonzero()[0]
+    if not len(filled):
+        return 0, 0
+    step, serial = layout['step'], layout['rows']['serial']
+    first = int(filled[0])
+    if (carry + first) % step == serial:
+        return 0, 0
+    # Rows went missing at the page break: drop the broken block on both
+    # sides and carry on from the first block that starts on this page
+    return carry, (first - serial) % step
+
+
+def drop_last_rows(tables, n):
+    # Drop the last n rows of a list of tables, in place
+    while n and tables:
+        if len(tables[-1]) <= n:
+            n -= len(tables.pop())
+        else:
+            tables[-1] = tables[-1].iloc[:len(tables[-1]) - n]
+            n = 0
+
+
+def align_table(tables, rows, table, page, layout):
+    # table, less any leading rows of a student block broken at the page
+    # break, after the `rows` rows of its group in tables, whose broken
+    # block is dropped too. Returns (table, rows left in tables).
+    drop_before, drop_after = block_alignment(rows % layout['step'], table, layout)
+    if drop_before or drop_after:
+        logger.warning("page %s: a student block is split across the page break with rows missing; "
+                       "dropping %d + %d rows", page, drop_before, drop_after)
+        current_metrics().count('rows_dropped_misaligned', drop_before + drop_after)
+        drop_last_rows(tables, drop_before)
+        table = table.iloc[drop_after:].reset_index(drop=True)
+    return table, rows - drop_before
+
+
+def group_tables(pages, layout):
+    # The tables of consecutive pages with the same metadata as one table per
+    # group. Every table is tagged with its metadata and its source 'Page',
+    # collected per group and concatenated once at the end of the group,
+    # with student blocks that continue across a page break kept whole.
+    import pandas as pd
+
+    groups = []
+
+    for page in pages:
+        metadata = page['metadata']
+        for table in page['tables']:
+            # Add metadata columns to the DataFrame
+            for key in layout['metadata_keys']:
+                table[key] = metadata.get(key)
+            table['Page'] = page['page']
+
+            current_metadata = tuple(metadata.get(key) for key in layout['group_keys'])
+            if not groups or groups[-1]['metadata'] != current_metadata:
+                groups.append({'metadata': current_metadata, 'tables': [], 'rows': 0})
+            group = groups[-1]
+            table, group['rows'] = align_table(group['tables'], group['rows'], table, page['page'],
+                                               page_layout(layout, metadata))
+            group['tables'].append(table)
+            group['rows'] += len(table)
+
+    result_dfs = []
+    for group in groups:
+        tables = group['tables']
+        if not tables:
+            continue
+        df = tables[0] if len(tables) == 1 else pd.concat(tables, ignore_index=True)
+        if not df.empty:
+            result_dfs.append(df)
+    if not pages:
+        logger.info("No pages with the specified Institution found.")
+
+    return result_dfs
+
+
+def student_records(cleaned_df):
+    # One flat record per student, carrying the keys used for nesting
+    for _, row in cleaned_df.iterrows():
+        yield {
+            'Batch': row['Batch'],
+            'Programme Name': row['Programme_Name'],
+            'Sem': row['Sem'],
+            'Examination': row['Examination'],
+            'Enrollment': row['Enrollment No.'],
+            'Name': row['Name'],
+            'CGPA': row['CGPA'],
+            'Papers': [{
+                'ID': row['PaperID'],
+                'Credits': str(row['Credits']),
+                'Int_Marks': str(row['Int_Marks']),
+                'Ext_Marks': str(row['Ext_Marks']),
+                'Total': str(row['Total'])
+            }]
+        }
+
+
+def nest_records(records):
+    result = {}
+
+    for record in records:
+        batch = record['Batch']
+        programme_name = record['Programme Name']
+        sem = record['Sem']
+        examination = record['Examination']
+
+        # Create nested structure
+        if batch not in result:
+            result[batch] = {}
+        if programme_name not in result[batch]:
+            result[batch][programme_name] = {}
+        if sem not in result[batch][programme_name]:
+            result[batch][programme_name][sem] = {}
+        if examination not in result[batch][programme_name][sem]:
+            result[batch][programme_name][sem][examination] = []
+
+        # Append paper details to the list
+        result[batch][programme_name][sem][examination].append({
+            'Enrollment': record['Enrollment'],
+            'Name': record['Name'],
+            'CGPA': record['CGPA'],
+            'Papers': record['Papers']
+        })
+
+    return result
+
+
+def nest_results(cleaned_result_dfs):
+    return nest_records(record for df in cleaned_result_dfs for record in student_records(df))
+
+
+def institution_key(institution):
+    # Stable text form of the `institution` argument, for cache keys
+    if institution is None or isinstance(institution, str):
+        return str(institution)
+    return '|'.join(sorted(institution))
+
+
+def clean_tables(pages, layout):
+    # Grouped tables -> cleaned tables, one row per student
+    metrics = current_metrics()
+    with metrics.stage('grouping'):
+        result_dfs = group_tables(pages, layout)
+
+    cleaned_result_dfs = []
+    with metrics.stage('cleaning_preprocessing'):
+        for df in result_dfs:
+            cleaned_result_dfs.append(layout['cleaning_preprocessing'](df))
+    metrics.count('students', sum(len(df) for df in cleaned_result_dfs))
+    return cleaned_result_dfs
+
+
+def build_result_set(pages, layout):
+    # Grouped tables -> cleaned tables -> model.ResultSet. Each cleaned table
+    # is packed into the compact store straight away and then dropped.
+    from model import ResultSet
+
+    metrics = current_metrics()
+    with metrics.stage('grouping'):
+        result_dfs = group_tables(pages, layout)
+
+    results = ResultSet()
+    while result_dfs:
+        df = result_dfs.pop(0)
+        with metrics.stage('cleaning_preprocessing'):
+            cleaned = layout['cleaning_preprocessing'](df)
+        with metrics.stage('compact'):
+            results.add_cleaned(cleaned)
+    metrics.count('students', len(results))
+    return results
+
+
+def build_result(pages, layout):
+    # Grouped tables -> cleaned tables -> nested result
+    results = build_result_set(pages, layout)
+    with current_metrics().stage('nesting'):
+        return results.nested()
+
+
+def split_by_institution(pages):
+    # Route every page to the bucket of its institution, keeping page order
+    buckets = {}
+    for page in pages:
+        buckets.setdefault(page['metadata'].get('Institution'), []).append(page)
+    return buckets
+
+
+def matching_pages(pages, institution):
+    # The pages of `institution` among pages extracted for more of them
+    return [page for page in pages if institution_matches(page['metadata'].get('Institution'), institution)]
+
+
+def build_results(pages, layout, institution):
+    # What extract_result (one institution) or extract_by_institution
+    # (several) returns for these pages
+    if isinstance(institution, str) and institution != ALL_INSTITUTIONS:
+        return build_result(pages, layout)
+    return {name: build_result(bucket, layout) for name, bucket in split_by_institution(pages).items()}
+
+
+def extract_result(file_stream, layout, institution=DEFAULT_INSTITUTION, table_backend='words', workers=1, cache=None,
+                   page_cache=None, prefilter=True, memory_budget=None):
+    # Full pipeline for one layout and institution. With a ResultCache, a PDF
+    # already processed with the same format and options is served from
+    # disk; with a page cache, only pages not seen before are parsed.
+    # Several institutions go through extract_by_institution, which keeps
+    # their results apart.
+    if not isinstance(institution, str) or institution == ALL_INSTITUTIONS:
+        raise ValueError("extract_result takes a single institution; use extract_by_institution for several")
+    key = None
+    if cache is not None:
+        key = result_key(hash_source(file_stream), layout['name'], institution_key(institution), table_backend)
+        cached = cache.get(key)
+        if cached is not None:
+            current_metrics().count('result_cache_hits')
+            return cached['result']
+
+    pages = extract_pages(file_stream, layout, institution=institution, table_backend=table_backend, workers=workers,
+                          page_cache=page_cache, prefilter=prefilter, memory_budget=memory_budget)
+    result = build_result(pages, layout)
+
+    if cache is not None:
+        cache.put(key, {'pages': pages, 'result': result})
+    return result
+
+
+def extract_by_institution(file_stream, layout, institutions=ALL_INSTITUTIONS, table_backend='words', workers=1,
+                           cache=None, page_cache=None, prefilter=True, memory_budget=None):
+    # Results of many institutions from a single scan of the document:
+    # {institution: Batch -> Programme -> Sem -> Examination}
+    if isinstance(institutions, str) and institutions != ALL_INSTITUTIONS:
+        institutions = [institutions]
+    if institutions != ALL_INSTITUTIONS:
+        institutions = frozenset(institutions)
+
+    key = None
+    if cache is not None:
+        key = result_key(hash_source(file_stream), layout['name'], 'by-institution', institution_key(institutions),
+                         table_backend)
+        cached = cache.get(key)
+        if cached is not None:
+            current_metrics().count('result_cache_hits')
+            return cached['result']
+
+    pages = extract_pages(file_stream, layout, institution=institutions, table_backend=table_backend,
+                          workers=workers, page_cache=page_cache, prefilter=prefilter, memory_budget=memory_budget)
+    results = build_results(pages, layout, institutions)
+
+    if cache is not None:
+        cache.put(key, {'pages': pages, 'result': results})
+    return results
+
+
+def iter_layout_records(file_stream, layout, institution=DEFAULT_INSTITUTION, table_backend='words', workers=1,
+                        page_cache=None, prefilter=True, memory_budget=None):
+    # Streaming counterpart of group_tables + cleaning_preprocessing: rows of
+    # the current metadata group are buffered only until a student block of
+    # layout['step'] rows is complete, then the block is cleaned and yielded
+    import pandas as pd
+
+    if table_backend == 'tabula':
+        pages = extract_pages(file_stream, layout, institution, table_backend, workers, page_cache, prefilter,
+                              memory_budget)
+    else:
+        pages = iter_pages(file_stream, layout, institution, table_backend, workers, page_cache, prefilter,
+                           memory_budget)
+
+    previous_metadata = None
+    pending = None
+
+    for page in pages:
+        metadata = page['metadata']
+        for table in page['tables']:
+            for key in layout['metadata_keys']:
+                table[key] = metadata.get(key)
+            table['Page'] = page['page']
+
+            current_metadata = tuple(metadata.get(key) for key in layout['group_keys'] + ['Institution'])
+            if pending is not None and current_metadata == previous_metadata:
+                # pending holds only the unfinished block of the group
+                kept = [pending]
+                table, _ = align_table(kept, len(pending), table, page['page'], page_layout(layout, metadata))
+                pending = pd.concat(kept + [table], ignore_index=True)
+            else:
+                # A trailing partial block of the previous group is dropped,
+                # exactly as cleaning_preprocessing does
+                previous_metadata = current_metadata
+                pending, _ = align_table([], 0, table, page['page'], page_layout(layout, metadata))
+                step = page_layout(layout, metadata)['step']
+
+            complete = len(pending) - len(pending) % step
+            if complete:
+                block = pending.iloc[:complete].reset_index(drop=True)
+                pending = pending.iloc[complete:].reset_index(drop=True)
+                with current_metrics().stage('cleaning_preprocessing'):
+                    cleaned = layout['cleaning_preprocessing'](block)
+                current_metrics().count('students', len(cleaned))
+                for record in student_records(cleaned):
+                    record['Institution'] = metadata.get('Institution')
+                    yield record
@@ -0,0 +1,47 @@
+# Page header fields, located once in the header region of the page. The
+# region ends at the first `end` (the 'CS/Remarks' column closing the
+# Institution line), so the result table below it is never searched. A
+# field's value runs from its label to the next label or the end of its line.
+#
+# Labels are plain text, matched case-insensitively. One alternation regex
+# over all labels was measured slower than this: re tries every branch at
+# every position, where str.find scans for each label in C.
+
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+class HeaderParser:
+    # fields is a list of (key, label); stops are labels that only end the
+    # value before them. A field missing from the header is None, and only
+    # the first occurrence of a label counts.
+
+    __slots__ = ('keys', 'labels', 'end')
+
+    def __init__(self, fields, stops=(), end='CS/Remarks'):
+        self.keys = [key for key, _ in fields]
+        self.labels = [(label.translate(ASCII_LOWER), key) for key, label in fields]
+        self.labels += [(label.translate(ASCII_LOWER), None) for label in list(stops) + [end]]
+        self.end = end
+
+    def __call__(self, text):
+        stop = text.find(self.end)
+        header = text if stop < 0 else text[:stop + len(self.end)]
+        # str.lower is much faster, but may change the length of non-ASCII text
+        lower = header.lower() if header.isascii() else header.translate(ASCII_LOWER)
+
+        # (label position, value start, key) in header order
+        found = []
+        for label, key in self.labels:
+            position = lower.find(label)
+            if position >= 0:
+                found.append((position, position + len(label), key))
+        found.sort()
+
+        data = dict.fromkeys(self.keys)
+        for k, (_, start, key) in enumerate(found):
+            if key is None:
+                continue
+            stop = found[k + 1][0] if k + 1 < len(found) else len(header)
+            newline = header.find('\n', start, stop)
+            data[key] = header[start:stop if newline < 0 else newline].strip()
+        return data
@@ -0,0 +1,307 @@
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import DEFAULT_CACHE_DIR, ResultCache
+from metrics import Metrics, collect as collect_metrics
+from records import extract, layout_for
+from spool import copy_source
+from warmup import preload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(DEFAULT_CACHE_DIR, 'jobs'))
+DEFAULT_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Resident memory in MB each job worker is kept near (engine.iter_windows)
+MEMORY_BUDGET = float(os.environ['JOB_MEMORY_BUDGET']) if os.environ.get('JOB_MEMORY_BUDGET') else None
+POLL_INTERVAL = 0.5
+# Finished jobs, with their results, are deleted this many seconds after
+# they finish; checked every CLEANUP_INTERVAL seconds
+RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 24 * 3600))
+CLEANUP_INTERVAL = 600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    fmt TEXT NOT NULL,
+    institution TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    result_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    profiler TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def connect(db_path, check_same_thread=True):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class JobMetrics(Metrics):
+    # Metrics that also publish page progress to the job row and stop the
+    # extraction when the job has been cancelled
+
+    def __init__(self, db_path, job_id):
+        super().__init__()
+        self.conn = connect(db_path)
+        self.job_id = job_id
+        self.done = 0
+
+    def count(self, name, n=1):
+        super().count(name, n)
+        if name in ('pages_total', 'pages_prefiltered_out'):
+            total = self.counters.get('pages_total', 0) - self.counters.get('pages_prefiltered_out', 0)
+            self.conn.execute('UPDATE jobs SET pages_total = ? WHERE id = ?', (total, self.job_id))
+
+    def page(self, number, seconds, matched, cached=False):
+        super().page(number, seconds, matched, cached)
+        self.done += 1
+        # fetchall, so the statement finishes and releases the write lock
+        rows = self.conn.execute(
+            'UPDATE jobs SET pages_done = ? WHERE id = ? RETURNING cancel_requested', (self.done, self.job_id)
+        ).fetchall()
+        if rows and rows[0]['cancel_requested']:
+            raise JobCancelled(self.job_id)
+
+
+def decode_institution(text):
+    institution = json.loads(text)
+    if isinstance(institution, list):
+        return frozenset(institution)
+    return institution
+
+
+def encode_institution(institution):
+    if isinstance(institution, str):
+        return json.dumps(institution)
+    return json.dumps(sorted(institution))
+
+
+def remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def run_job(db_path, job_id):
+    # Worker process entry point. Every outcome is written to the job row;
+    # nothing is raised back to the pool.
+    conn = connect(db_path)
+    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    metrics = JobMetrics(db_path, job_id)
+    try:
+        with collect_metrics(job['profiler'], metrics=metrics):
+            result = extract(job['pdf_path'], job['fmt'], decode_institution(job['institution']), cache=ResultCache(),
+                             memory_budget=MEMORY_BUDGET)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(job['result_path']), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'result': result, 'metrics': metrics.as_dict()}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, job['result_path'])
+        status, error = DONE, None
+    except JobCancelled:
+        status, error = CANCELLED, None
+    except Exception:
+        status, error = FAILED, traceback.format_exc()
+    finally:
+        remove_file(job['pdf_path'])
+
+    conn.execute('UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?',
+                 (status, error, time.time(), job_id))
+    return status
+
+
+class JobManager:
+    # Extraction jobs queued in SQLite and run by a bounded process pool.
+    # A dispatcher thread starts queued jobs as workers free up, always
+    # picking from the owner with the fewest running jobs so one user's
+    # batch of uploads cannot starve everybody else.
+
+    def __init__(self, directory=DEFAULT_JOBS_DIR, workers=DEFAULT_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, 'jobs.sqlite')
+        # Shared by the dispatcher and the Streamlit script threads, under self.lock
+        self.conn = connect(self.db_path, check_same_thread=False)
+        # WAL sticks to the database file, so workers can write progress
+        # while the UI reads
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+        # Jobs left running by a previous server process start over
+        self.execute('UPDATE jobs SET status = ?, pages_done = 0 WHERE status = ?', (QUEUED, RUNNING))
+
+        self.pool = self.new_pool()
+        self.running = {}
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.dispatcher = threading.Thread(target=self.dispatch, name='job-dispatcher', daemon=True)
+        self.dispatcher.start()
+
+    def new_pool(self):
+        # spawn, not fork: the server process runs threads, and a forked
+        # worker would inherit whatever locks they held at that moment
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def warm_up(self):
+        # Have the worker processes import the extraction engines now, so the
+        # first job does not pay for it
+        for _ in range(self.workers):
+            self.pool.submit(preload)
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def submit(self, source, fmt, institution, owner='anonymous', profiler=None):
+        # source is the PDF bytes, a file object or a path; it is spooled
+        # into the jobs directory so the caller's file can go away, and the
+        # worker reads that file. Returns the job id.
+        layout_for(fmt)
+        job_id = uuid.uuid4().hex
+        pdf_path = os.path.join(self.directory, job_id + '.pdf')
+        with open(pdf_path, 'wb') as f:
+            copy_source(source, f)
+
+        self.execute(
+            'INSERT INTO jobs (id, owner, fmt, institution, pdf_path, result_path, status, profiler, created) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, owner, fmt, encode_institution(institution), pdf_path,
+             os.path.join(self.directory, job_id + '.pkl'), QUEUED, profiler, time.time()),
+        )
+        self.wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        rows = self.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def jobs(self, owner=None):
+        if owner is None:
+            rows = self.execute('SELECT * FROM jobs ORDER BY created')
+        else:
+            rows = self.execute('SELECT * FROM jobs WHERE owner = ? ORDER BY created', (owner,))
+        return [dict(row) for row in rows]
+
+    def result(self, job_id):
+        # {'result': ..., 'metrics': ...} of a finished job, else None
+        job = self.status(job_id)
+        if job is None or job['status'] != DONE:
+            return None
+        with open(job['result_path'], 'rb') as f:
+            return pickle.load(f)
+
+    def cancel(self, job_id):
+        # Queued jobs are cancelled at once; running ones stop at their next page
+        if self.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ? RETURNING id',
+                        (CANCELLED, time.time(), job_id, QUEUED)):
+            remove_file(os.path.join(self.directory, job_id + '.pdf'))
+        self.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, RUNNING))
+
+    def cleanup(self, ttl=RESULT_TTL):
+        # Delete the jobs that finished more than ttl seconds ago, with their
+        # result files
+        expired = self.execute('DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished < ? RETURNING id',
+                               FINISHED + (time.time() - ttl,))
+        for row in expired:
+            remove_file(os.path.join(self.directory, row['id'] + '.pkl'))
+            remove_file(os.path.join(self.directory, row['id'] + '.pdf'))
+        return len(expired)
+
+    def next_job(self):
+        # Oldest queued job of the owner with the fewest running jobs
+        rows = self.execute(
+            'SELECT q.id, q.pdf_path FROM jobs q '
+            'LEFT JOIN (SELECT owner, COUNT(*) AS n FROM jobs WHERE status = ? GROUP BY owner) r '
+            'ON r.owner = q.owner '
+            'WHERE q.status = ? ORDER BY COALESCE(r.n, 0), q.created LIMIT 1',
+            (RUNNING, QUEUED),
+        )
+        return rows[0] if rows else None
+
+    def fail(self, job_id, error):
+        self.execute('UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?',
+                     (FAILED, error, time.time(), job_id))
+        remove_file(os.path.join(self.directory, job_id + '.pdf'))
+
+    def restart_pool(self):
+        # A worker died (killed for memory, say) and took the pool with it
+        logger.error("job worker pool broken; starting a new one")
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self.new_pool()
+
+    def dispatch(self):
+        cleaned = 0
+        while not self.stopped:
+            if time.monotonic() - cleaned > CLEANUP_INTERVAL:
+                self.cleanup()
+                cleaned = time.monotonic()
+            broken = False
+            for job_id, future in list(self.running.items()):
+                if future.done():
+                    del self.running[job_id]
+                    if future.exception() is not None:
+                        logger.error("job %s crashed: %s", job_id, future.exception())
+                        self.fail(job_id, str(future.exception()) or type(future.exception()).__name__)
+                        broken |= isinstance(future.exception(), BrokenProcessPool)
+            if broken:
+                self.restart_pool()
+
+            while len(self.running) < self.workers:
+                job = self.next_job()
+                if job is None:
+                    break
+                # A job cancelled since next_job() picked it is not started
+                if not self.execute('UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ? RETURNING id',
+                                    (RUNNING, time.time(), job['id'], QUEUED)):
+                    continue
+                try:
+                    self.running[job['id']] = self.pool.submit(run_job, self.db_path, job['id'])
+                except BrokenProcessPool as e:
+                    logger.error("job %s not started: %s", job['id'], e)
+                    self.fail(job['id'], f"job worker pool broken: {e}")
+                    self.restart_pool()
+
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def shutdown(self):
+        self.stopped = True
+        self.wakeup.set()
+        self.dispatcher.join()
+        self.pool.shutdown(wait=False, cancel_futures=True)
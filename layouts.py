@@ -0,0 +1,308 @@
+import re
+from functools import partial
+
+from engine import ALL_INSTITUTIONS, DEFAULT_INSTITUTION, extract_by_institution, extract_result
+from headers import HeaderParser
+from metrics import collect as collect_metrics, current as current_metrics
+from sinks import json_sink
+
+# The result layouts differ only in the header fields, where each field sits
+# inside a student's block of rows, and how the paper and total cells are
+# written. Everything else is shared; a new layout is one more entry built
+# with make_layout. The cleaning functions, and pandas with them, are imported
+# when a table is first cleaned.
+
+SEM_NUMBERS = {
+    'FIRST': '01',
+    'SECOND': '02',
+    'THIRD': '03',
+    'FOURTH': '04',
+    'FIFTH': '05',
+    'SIXTH': '06',
+    'SEVENTH': '07',
+    'EIGHTH': '08',
+}
+
+
+def word_to_number(word):
+    parts = word.split(' ')
+    parts[0] = SEM_NUMBERS.get(parts[0], None)
+    return ' '.join(parts)
+
+
+def columns_between(df, start_column, end_column='CS/Remarks'):
+    # Names of the columns strictly between start_column and end_column
+    try:
+        start_index = df.columns.get_loc(start_column)
+        end_index = df.columns.get_loc(end_column)
+        if start_index > end_index:
+            raise ValueError("Start column is after the end column.")
+        return df.columns[start_index + 1:end_index].tolist()
+    except KeyError as e:
+        print(f"Column not found: {e}")
+        return []
+
+
+def attached_papers(papers, index):
+    # 'ES101(4)' tokens: paper ID with its credits attached
+    from cleaning import collect, explode_tokens, split_tokens
+
+    papers = split_tokens(papers).str.join(',').str.strip('[]').str.split(',')
+    papers, paper_position = explode_tokens(papers)
+    credits = papers.str.split('(').str[1].str.strip().str.split(')').str[0].str.strip()
+    return collect(papers.str.split('(').str[0].str.strip(), index), credits, paper_position
+
+
+def separate_papers(papers, index):
+    # 'ES101 (4)': paper IDs and "(credits)" tokens alternate
+    from cleaning import collect, explode_tokens, split_tokens
+
+    papers, paper_position = explode_tokens(split_tokens(papers))
+    credits = collect(papers[paper_position % 2 == 1], index).str.join(',').str.strip('[]').str.split(',')
+    credits, credits_position = explode_tokens(credits)
+    credits = credits.str.split('(').str[1].str.strip().str.split(')').str[0].str.strip()
+    return collect(papers[paper_position % 2 == 0], index), credits, credits_position
+
+
+def graded_totals(totals):
+    # 'total(grade)' tokens; ABS and starred marks do not count towards CGPA.
+    # Returns (Total column tokens, marks for CGPA, their positions, the
+    # total token of every paper in paper order, whether each paper counts
+    # towards the CGPA).
+    from cleaning import explode_tokens, marks_series, split_tokens
+
+    totals = split_tokens(totals).str.join(',').str.strip('[]').str.split(',')
+    totals, total_position = explode_tokens(totals)
+    totals = totals.str.split('(').str[0].str.strip()
+    marks = marks_series(totals, starred='skip')
+    return totals, marks, total_position, totals, marks.notna()
+
+
+def alternating_totals(totals):
+    # Total and grade tokens alternate; ABS is dropped and starred marks
+    # count as plain numbers. The per-paper tokens are taken before ABS is
+    # dropped, so they stay aligned with the papers.
+    from cleaning import explode_tokens, marks_series, split_tokens
+
+    totals, total_position = explode_tokens(split_tokens(totals))
+    paper_totals = totals[total_position % 2 == 0]
+    totals = paper_totals[(paper_totals != 'ABS').to_numpy()]
+    totals = marks_series(totals, starred='strip', absent=()).dropna().astype(int)
+    counted = marks_series(paper_totals, starred='strip').notna()
+    return totals, totals, totals.groupby(level=0).cumcount().to_numpy(), paper_totals, counted
+
+
+def cleaning_preprocessing(layout, df):
+    # One row per student with the header fields, paper IDs, credits, marks
+    # and CGPA, from a table of layout['step']-row student blocks
+    import pandas as pd
+
+    from cleaning import batched_cgpa, block_field, collect, explode_tokens, joined_cells, split_tokens, student_blocks
+
+    rows = layout['rows']
+    key_column = layout['key_column']
+    step_size = layout['step']
+
+    # Every student occupies step_size consecutive rows; reshape the table to
+    # (students, step_size, columns) and pick the fields out of each block
+    blocks = student_blocks(df, step_size)
+    cells = joined_cells(df, step_size, columns_between(df, key_column))
+
+    structured_df = pd.DataFrame({
+        'S.No.': block_field(df, blocks, rows['serial'], 'S.No.'),
+        'Batch': block_field(df, blocks, rows['serial'], 'Batch'),
+        'Programme_Name': block_field(df, blocks, rows['serial'], 'Programme Name'),
+        'Sem': block_field(df, blocks, rows['sem'], layout['sem_key']),
+        'Examination': block_field(df, blocks, rows['serial'], 'Examination'),
+        'Name': block_field(df, blocks, rows['name'], key_column),
+        'Enrollment No.': block_field(df, blocks, rows['enrollment'], key_column),
+        'PaperID': cells[:, rows['papers']],
+        'Marks': cells[:, rows['marks']],
+        'Total': cells[:, rows['totals']],
+    })
+    structured_df['Examination'] = structured_df['Examination'].str.split(' ').str[0].str.strip()
+    missing_name = structured_df['Name'].isna()
+    current_metrics().count('students_dropped_no_name', int(missing_name.sum()))
+    structured_df = structured_df[~missing_name].reset_index(drop=True)
+    index = structured_df.index
+
+    structured_df['PaperID'], credits, credits_position = layout['split_papers'](structured_df['PaperID'], index)
+    totals, marks_for_cgpa, total_position, paper_totals, paper_counted = \
+        layout['split_totals'](structured_df['Total'])
+    structured_df['Total'] = collect(totals, index)
+    # One total token per paper, ABS included, and whether the paper counts
+    # towards the CGPA, for the long table
+    structured_df['Paper_Totals'] = collect(paper_totals, index)
+    structured_df['Paper_Counted'] = collect(paper_counted, index)
+
+    # Internal and external marks alternate
+    marks, marks_position = explode_tokens(split_tokens(structured_df['Marks']))
+    structured_df['Int_Marks'] = collect(marks[marks_position % 2 == 0], index)
+    structured_df['Ext_Marks'] = collect(marks[marks_position % 2 == 1], index)
+    structured_df['Credits'] = collect(credits, index)
+
+    if layout['sem_numbers']:
+        sems = structured_df['Sem']
+        structured_df['Sem'] = sems.map({sem: word_to_number(sem) for sem in sems.unique()})
+
+    structured_df = structured_df.drop(columns=['Marks'])
+    structured_df['CGPA'] = batched_cgpa(marks_for_cgpa, total_position, credits, credits_position,
+                                         structured_df['Examination'], index)
+    return structured_df
+
+
+def make_layout(name, marker, header_fields, sem_key, key_column, step, rows, split_papers, split_totals,
+                header_stops=(), sem_numbers=False, tabula_options=None):
+    # marker is a regex that only this layout's page headers match;
+    # header_fields and header_stops configure its headers.HeaderParser
+    header = HeaderParser(header_fields, header_stops)
+    layout = {
+        'name': name,
+        'marker': marker,
+        'header': header,
+        'sem_key': sem_key,
+        'step': step,
+        'rows': rows,
+        'split_papers': split_papers,
+        'split_totals': split_totals,
+        'sem_numbers': sem_numbers,
+        'header_anchor': 'S.No.',
+        'key_column': key_column,
+        'metadata_keys': ['Programme Name', sem_key, 'Batch', 'Examination', 'Institution'],
+        'group_keys': ['Programme Name', sem_key, 'Batch', 'Examination'],
+        'tabula_options': tabula_options or {},
+        'extract_data': header,
+    }
+    layout['cleaning_preprocessing'] = partial(cleaning_preprocessing, layout)
+    return layout
+
+
+FORMAT1 = make_layout(
+    'format1',
+    marker=r'Sem\./Year:',
+    header_fields=[
+        ('Programme Name', 'Programme Name:'),
+        ('Sem./Year', 'Sem./Year:'),
+        ('Batch', 'Batch:'),
+        ('Examination', 'Examination:'),
+        ('Result Declared Date', 'Result Declared Date:'),
+        ('Institution', 'Institution:'),
+    ],
+    # The other layout's semester label still ends the programme name
+    header_stops=['Sem./Year/EU:'],
+    sem_key='Sem./Year',
+    key_column='Roll no./Name',
+    step=5,
+    # Enrollment, name, int/ext marks, grades, S.No. and totals
+    rows={'enrollment': 0, 'name': 1, 'sem': 4, 'serial': 4, 'papers': 0, 'marks': 2, 'totals': 4},
+    split_papers=attached_papers,
+    split_totals=graded_totals,
+    tabula_options={'multiple_tables': True},
+)
+
+FORMAT2 = make_layout(
+    'format2',
+    marker=r'Sem\./Year/EU:',
+    header_fields=[
+        ('Programme Name', 'Programme Name:'),
+        ('Sem./Year/EU', 'Sem./Year/EU:'),
+        ('Batch', 'Batch:'),
+        ('Examination', 'Examination:'),
+        ('Result Declared Date', 'Result Declared Date:'),
+        ('Institution', 'Institution:'),
+    ],
+    header_stops=['Sem./Year:'],
+    sem_key='Sem./Year/EU',
+    key_column='Unnamed: 0',
+    step=6,
+    # Enrollment, papers, name, grades, marks and S.No., totals
+    rows={'enrollment': 0, 'papers': 1, 'name': 2, 'sem': 2, 'serial': 4, 'marks': 4, 'totals': 5},
+    split_papers=separate_papers,
+    split_totals=alternating_totals,
+    sem_numbers=True,
+)
+
+LAYOUTS = {layout['name']: layout for layout in (FORMAT1, FORMAT2)}
+
+
+# One search for every layout's marker, which stops in the page header
+MARKERS = re.compile('|'.join(f"(?P<{name}>{layout['marker']})" for name, layout in LAYOUTS.items()))
+
+
+def detect_layout(text):
+    # The layout whose header marker appears first in the page text, or None
+    match = MARKERS.search(text)
+    return None if match is None else LAYOUTS[match.lastgroup]
+
+
+def extract_any(text):
+    # Header fields of whichever layout the page is in, plus its 'Layout'
+    layout = detect_layout(text)
+    if layout is None:
+        data = {key: None for key in AUTO['metadata_keys']}
+    else:
+        data = layout['extract_data'](text)
+    data['Layout'] = None if layout is None else layout['name']
+    return data
+
+
+def clean_any(df):
+    # Tables are grouped per layout, so the whole table shares one
+    return LAYOUTS[df['Layout'].iloc[0]]['cleaning_preprocessing'](df)
+
+
+def union(lists):
+    merged = []
+    for items in lists:
+        merged += [item for item in items if item not in merged]
+    return merged
+
+
+# Detects the layout of every page from its header, so documents that mix
+# layouts are parsed page by page. The engine takes the key column and block
+# size of each page from layouts[metadata['Layout']].
+AUTO = {
+    'name': 'auto',
+    'extract_data': extract_any,
+    'cleaning_preprocessing': clean_any,
+    'step': None,
+    'header_anchor': 'S.No.',
+    'key_column': None,
+    'metadata_keys': union(layout['metadata_keys'] for layout in LAYOUTS.values()) + ['Layout'],
+    'group_keys': union(layout['group_keys'] for layout in LAYOUTS.values()) + ['Layout'],
+    'tabula_options': {'multiple_tables': True},
+    'layouts': LAYOUTS,
+}
+
+
+def extract_to_json(file_stream, layout, institution=DEFAULT_INSTITUTION, table_backend='words', workers=1,
+                    cache=None, page_cache=None, prefilter=True, with_metrics=False, profiler=None,
+                    output='result.json', memory_budget=None):
+    # extract_result, also written out through sinks.json_sink(output). When
+    # `institution` is a collection of names or ALL_INSTITUTIONS the result
+    # is {institution: nested}, as records.extract gives. Every page is read
+    # once; tabula is only used when
+    # table_backend='tabula'. With workers > 1 the pages are sharded across a
+    # process pool. With a cache.ResultCache a PDF seen before is not parsed
+    # again, and with a page_cache only the pages changed since an earlier
+    # issue are parsed. prefilter skips pages that never mention the
+    # institution. with_metrics=True returns (result, metrics.Metrics);
+    # profiler can be 'cprofile' or 'pyinstrument'. output is a path, None
+    # for no file, sinks.UNIQUE for a file of its own, or a sinks.JsonSink
+    # for compact or fast encoding. memory_budget (MB) keeps the resident
+    # memory of a very long PDF near it, and the peak is reported in
+    # metrics.memory.
+    with collect_metrics(profiler) as metrics:
+        if isinstance(institution, str) and institution != ALL_INSTITUTIONS:
+            extract = partial(extract_result, institution=institution)
+        else:
+            extract = partial(extract_by_institution, institutions=institution)
+        result = extract(file_stream, layout, table_backend=table_backend, workers=workers, cache=cache,
+                         page_cache=page_cache, prefilter=prefilter, memory_budget=memory_budget)
+
+        with metrics.stage('json_write'):
+            json_sink(output).write(result)
+
+    if with_metrics:
+        return result, metrics
+    return result
@@ -0,0 +1,76 @@
+import logging
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Memory accounting for the bounded-memory page mode. Each parsed page is
+# released as soon as its header and table have been read, but pdfminer
+# keeps every object it has resolved until the document is closed. With a
+# budget, pages are parsed one window at a time instead, each window copied
+# into a small PDF of its own that is closed after it, and every window is
+# sized from the memory the previous one took.
+
+MIN_WINDOW = 4
+MAX_WINDOW = 256
+FIRST_WINDOW = 32
+# Least memory a page is assumed to take, so a window that happened to reuse
+# memory freed by the one before does not make the next one huge
+MIN_PAGE_MB = 0.25
+
+# Budgets already warned about in this process; worker processes size their
+# windows for every chunk of pages
+warned_budgets = set()
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def peak_rss_mb():
+    # Highest resident memory of this process so far, or None where the
+    # platform does not report it
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    # Resident memory of this process now; the peak where /proc is missing
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb() or 0.0
+
+
+class PageWindow:
+    # Pages per window under a budget of resident memory in MB. After each
+    # window the memory it took per page is measured, and the next window is
+    # as large as the room left under the budget allows.
+
+    def __init__(self, budget_mb):
+        self.budget = budget_mb
+        self.size = FIRST_WINDOW
+        self.before = 0.0
+
+    def start(self):
+        self.before = current_rss_mb()
+
+    def finish(self, pages):
+        # Called while the window's document is still open, so its caches count
+        per_page = max((current_rss_mb() - self.before) / max(pages, 1), MIN_PAGE_MB)
+        room = self.budget - self.before
+        if room < MIN_WINDOW * per_page and self.budget not in warned_budgets:
+            logger.warning("resident memory of %.0f MB leaves no room under the budget of %.0f MB; "
+                           "parsing %d pages at a time", self.before, self.budget, MIN_WINDOW)
+            warned_budgets.add(self.budget)
+        self.size = max(MIN_WINDOW, min(int(room / per_page), MAX_WINDOW))
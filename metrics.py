@@ -0,0 +1,125 @@
+import contextvars
+import io
+import time
+from contextlib import contextmanager
+
+from memory import peak_rss_mb
+
+_current = contextvars.ContextVar('metrics', default=None)
+
+
+class Metrics:
+    # Wall time per pipeline stage, event counters, per-page timings and
+    # peak memory of one extraction. Worker processes report their page
+    # times back, so in parallel runs the 'pdfplumber' stage is the sum over
+    # all workers.
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.pages = []
+        self.memory = {}
+        self.profile = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def page(self, number, seconds, matched, cached=False):
+        self.pages.append({'page': number, 'seconds': seconds, 'matched': matched, 'cached': cached})
+
+    def peak(self, name, mb):
+        # Keep the highest of the memory readings (MB) reported under name
+        if mb is not None:
+            self.memory[name] = max(self.memory.get(name, 0.0), mb)
+
+    def as_dict(self):
+        return {
+            'stages': dict(self.stages),
+            'counters': dict(self.counters),
+            'pages': list(self.pages),
+            'memory': dict(self.memory),
+            'profile': self.profile,
+        }
+
+
+class NullMetrics(Metrics):
+    # Used when nobody is collecting; every call is a no-op
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def page(self, number, seconds, matched, cached=False):
+        pass
+
+    def peak(self, name, mb):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def current():
+    # The Metrics being collected in this context, or a no-op stand-in
+    return _current.get() or NULL_METRICS
+
+
+def profile_report(profiler, limit=40):
+    import pstats
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+@contextmanager
+def collect(profiler=None, metrics=None):
+    # Collect metrics for everything run inside the block, into `metrics` or
+    # a new Metrics, including the peak resident memory of this process in
+    # metrics.memory['peak_rss_mb']. profiler may be 'cprofile' or
+    # 'pyinstrument' to also capture a profile report in metrics.profile.
+    if metrics is None:
+        metrics = Metrics()
+    token = _current.set(metrics)
+
+    if profiler == 'cprofile':
+        import cProfile
+        active = cProfile.Profile()
+        active.enable()
+    elif profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        active = Profiler()
+        active.start()
+    elif profiler is not None:
+        raise ValueError(f"Unknown profiler: {profiler}")
+
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_time('total', time.perf_counter() - start)
+        metrics.peak('peak_rss_mb', peak_rss_mb())
+        if profiler == 'cprofile':
+            active.disable()
+            metrics.profile = profile_report(active)
+        elif profiler == 'pyinstrument':
+            active.stop()
+            metrics.profile = active.output_text()
+        _current.reset(token)
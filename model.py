@@ -0,0 +1,190 @@
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+
+# Compact, array-backed store for extracted students. A student costs a few
+# array slots instead of a dict of lists of strings: paper IDs are interned,
+# marks and credits are small ints, and the few tokens that are not plain
+# numbers ('ABS', '67*', ...) are interned too. The nested dicts of the
+# public API are only built from it at the end, by nested().
+
+# Marks, credits and totals are stored as int16 codes: a plain number is its
+# own code, any other token is -1 - its position in ResultSet.tokens
+NUMBER = r'0|[1-9]\d{0,3}'
+TOKEN_LIMIT = 32768
+
+
+@dataclass(frozen=True, slots=True)
+class Group:
+    # What the students of one result table share. int_totals is set when
+    # the layout cleans totals to ints rather than keeping the tokens.
+    batch: object
+    programme: object
+    sem: object
+    examination: object
+    int_totals: bool
+
+
+class Ragged:
+    # One variable-length list per student, flattened into `values` with the
+    # end offset of every student's list in `ends`
+
+    __slots__ = ('values', 'ends')
+
+    def __init__(self, typecode):
+        self.values = array(typecode)
+        self.ends = array('I')
+
+    def extend(self, codes, counts):
+        start = len(self.values)
+        self.values.frombytes(np.asarray(codes, dtype=self.values.typecode).tobytes())
+        self.ends.frombytes((start + np.cumsum(counts, dtype=np.int64)).astype('I').tobytes())
+
+    def row(self, i):
+        start = self.ends[i - 1] if i else 0
+        return self.values[start:self.ends[i]]
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values) + self.ends.itemsize * len(self.ends)
+
+
+def flatten(lists):
+    # (flat tokens, list lengths) of an object Series of lists
+    counts = lists.str.len().fillna(0).to_numpy(dtype=np.int64)
+    flat = lists.explode()
+    return flat[flat.notna()], counts
+
+
+class ResultSet:
+    # Students in extraction order, added one cleaned table at a time
+
+    __slots__ = ('groups', 'group_index', 'paper_ids', 'paper_index', 'tokens', 'token_index', 'group', 'enrollment',
+                 'name', 'cgpa', 'no_cgpa', 'papers', 'credits', 'int_marks', 'ext_marks', 'totals')
+
+    def __init__(self):
+        self.groups = []
+        self.group_index = {}
+        self.paper_ids = []
+        self.paper_index = {}
+        self.tokens = []
+        self.token_index = {}
+        self.group = array('I')
+        self.enrollment = []
+        self.name = []
+        self.cgpa = array('d')
+        # 1 where CGPA is None (not a regular examination) rather than a number
+        self.no_cgpa = array('b')
+        self.papers = Ragged('I')
+        self.credits = Ragged('h')
+        self.int_marks = Ragged('h')
+        self.ext_marks = Ragged('h')
+        self.totals = Ragged('h')
+
+    def __len__(self):
+        return len(self.group)
+
+    def intern_group(self, group):
+        if group not in self.group_index:
+            self.group_index[group] = len(self.groups)
+            self.groups.append(group)
+        return self.group_index[group]
+
+    def intern_papers(self, ids):
+        codes = np.empty(len(ids), dtype=np.int64)
+        for k, paper_id in enumerate(ids):
+            code = self.paper_index.get(paper_id)
+            if code is None:
+                code = self.paper_index[paper_id] = len(self.paper_ids)
+                self.paper_ids.append(paper_id)
+            codes[k] = code
+        return codes
+
+    def encode(self, tokens):
+        # int16 codes of a Series of tokens (str, or int for int totals)
+        text = tokens.astype(str)
+        plain = text.str.fullmatch(NUMBER).to_numpy(dtype=bool)
+        codes = np.zeros(len(text), dtype=np.int64)
+        codes[plain] = text[plain].astype(int).to_numpy()
+        for k in np.flatnonzero(~plain):
+            token = text.iat[k]
+            code = self.token_index.get(token)
+            if code is None:
+                if len(self.tokens) >= TOKEN_LIMIT:
+                    raise OverflowError("Too many distinct non-numeric tokens")
+                code = self.token_index[token] = len(self.tokens)
+                self.tokens.append(token)
+            codes[k] = -1 - code
+        return codes
+
+    def decode(self, codes, as_int=False):
+        if as_int:
+            return [int(self.tokens[-1 - code]) if code < 0 else code for code in codes]
+        return [self.tokens[-1 - code] if code < 0 else str(code) for code in codes]
+
+    def add_cleaned(self, cleaned_df):
+        # Append the students of a cleaned table (cleaning_preprocessing
+        # output); rows that share header fields share one Group
+        if not len(cleaned_df):
+            return
+        totals, total_counts = flatten(cleaned_df['Total'])
+        int_totals = bool(len(totals)) and not isinstance(totals.iat[0], str)
+
+        keys = zip(cleaned_df['Batch'], cleaned_df['Programme_Name'], cleaned_df['Sem'], cleaned_df['Examination'])
+        self.group.extend(self.intern_group(Group(*key, int_totals)) for key in keys)
+        self.enrollment += cleaned_df['Enrollment No.'].tolist()
+        self.name += cleaned_df['Name'].tolist()
+        cgpa = cleaned_df['CGPA']
+        self.cgpa.frombytes(cgpa.to_numpy(dtype=float, na_value=np.nan).tobytes())
+        self.no_cgpa.frombytes(np.fromiter((value is None for value in cgpa), dtype=np.int8, count=len(cgpa)).tobytes())
+
+        ids, counts = flatten(cleaned_df['PaperID'])
+        self.papers.extend(self.intern_papers(ids.tolist()), counts)
+        for column, ragged in (('Credits', self.credits), ('Int_Marks', self.int_marks),
+                               ('Ext_Marks', self.ext_marks)):
+            tokens, counts = flatten(cleaned_df[column])
+            ragged.extend(self.encode(tokens), counts)
+        self.totals.extend(self.encode(totals), total_counts)
+
+    def record(self, i):
+        # The flat record of student i, as engine.student_records builds it
+        group = self.groups[self.group[i]]
+        return {
+            'Batch': group.batch,
+            'Programme Name': group.programme,
+            'Sem': group.sem,
+            'Examination': group.examination,
+            'Enrollment': self.enrollment[i],
+            'Name': self.name[i],
+            'CGPA': None if self.no_cgpa[i] else self.cgpa[i],
+            'Papers': [{
+                'ID': [self.paper_ids[code] for code in self.papers.row(i)],
+                'Credits': str(self.decode(self.credits.row(i))),
+                'Int_Marks': str(self.decode(self.int_marks.row(i))),
+                'Ext_Marks': str(self.decode(self.ext_marks.row(i))),
+                'Total': str(self.decode(self.totals.row(i), group.int_totals)),
+            }],
+        }
+
+    def nested(self):
+        # Batch -> Programme -> Sem -> Examination -> students
+        result = {}
+        for i in range(len(self)):
+            group = self.groups[self.group[i]]
+            record = self.record(i)
+            (result.setdefault(group.batch, {}).setdefault(group.programme, {}).setdefault(group.sem, {})
+             .setdefault(group.examination, []).append({
+                 'Enrollment': record['Enrollment'],
+                 'Name': record['Name'],
+                 'CGPA': record['CGPA'],
+                 'Papers': record['Papers'],
+             }))
+        return result
+
+    def nbytes(self):
+        # Approximate memory held, including the interned strings
+        arrays = [self.group, self.cgpa, self.no_cgpa]
+        strings = self.enrollment + self.name + self.paper_ids + self.tokens
+        return (sum(a.itemsize * len(a) for a in arrays)
+                + sum(r.nbytes() for r in (self.papers, self.credits, self.int_marks, self.ext_marks, self.totals))
+                + sum(len(s) + 49 for s in strings if isinstance(s, str)) + 8 * (len(self.enrollment) + len(self.name)))
@@ -0,0 +1,68 @@
+from engine import (ALL_INSTITUTIONS, DEFAULT_INSTITUTION, extract_by_institution, extract_result, iter_layout_records,
+                    nest_records, open_document)
+from layouts import AUTO, LAYOUTS, detect_layout
+
+# 'auto' detects the layout of every page, so mixed documents work too
+FORMATS = dict(LAYOUTS, auto=AUTO)
+
+
+def layout_for(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    return FORMATS[fmt]
+
+
+def detect_format(file_stream):
+    # The layout of a gazette from its first result header
+    with open_document(file_stream) as doc:
+        for page in doc:
+            layout = detect_layout(page.get_text())
+            if layout is not None:
+                return layout['name']
+    raise ValueError("Could not detect the result format")
+
+
+def iter_records(file_stream, fmt='format1', institution=DEFAULT_INSTITUTION, table_backend='words', workers=1,
+                 page_cache=None, prefilter=True, memory_budget=None):
+    # Yield each student record (Enrollment, Name, CGPA, Papers plus the
+    # Batch/Programme/Sem/Examination it belongs to) as soon as its block of
+    # rows is complete, so memory stays flat however long the PDF is.
+    # `institution` may also be a collection of names or ALL_INSTITUTIONS;
+    # every record carries its 'Institution'.
+    return iter_layout_records(file_stream, layout_for(fmt), institution=institution, table_backend=table_backend, workers=workers,
+                               page_cache=page_cache, prefilter=prefilter, memory_budget=memory_budget)
+
+
+def nest(records):
+    # Build the Batch -> Programme -> Sem -> Examination result from records
+    return nest_records(records)
+
+
+def nest_by_institution(records):
+    # {institution: nested result} from records of several institutions
+    buckets = {}
+    for record in records:
+        buckets.setdefault(record['Institution'], []).append(record)
+    return {institution: nest_records(bucket) for institution, bucket in buckets.items()}
+
+
+def extract_institutions(file_stream, institutions=ALL_INSTITUTIONS, fmt='format1', table_backend='words', workers=1,
+                         cache=None, page_cache=None, prefilter=True, memory_budget=None):
+    # Scan the document once and return the results of every requested
+    # institution (or of all of them), keyed by institution name
+    return extract_by_institution(file_stream, layout_for(fmt), institutions=institutions, table_backend=table_backend,
+                                  workers=workers, cache=cache, page_cache=page_cache, prefilter=prefilter,
+                                  memory_budget=memory_budget)
+
+
+def extract(file_stream, fmt='format1', institution=DEFAULT_INSTITUTION, table_backend='words', workers=1, cache=None,
+            page_cache=None, prefilter=True, memory_budget=None):
+    # The nested result of one institution, or {institution: result} when
+    # `institution` is a collection of names or ALL_INSTITUTIONS
+    if isinstance(institution, str) and institution != ALL_INSTITUTIONS:
+        return extract_result(file_stream, layout_for(fmt), institution=institution, table_backend=table_backend,
+                              workers=workers, cache=cache, page_cache=page_cache, prefilter=prefilter,
+                              memory_budget=memory_budget)
+    return extract_institutions(file_stream, institutions=institution, fmt=fmt, table_backend=table_backend,
+                                workers=workers, cache=cache, page_cache=page_cache, prefilter=prefilter,
+                                memory_budget=memory_budget)
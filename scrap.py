@@ -1,8 +1,181 @@
 import streamlit as st
-import fitz  # PyMuPDF
-from result import format1
-from result2 import format2
+import analytics
+from cache import ResultCache, hash_source, result_key
+from engine import ALL_INSTITUTIONS, DEFAULT_INSTITUTION, institution_key
+from jobs import CANCELLED, DONE, QUEUED, RUNNING, JobManager
+from metrics import Metrics
+from store import DEFAULT_STORE_PATH, ResultStore
+import os
 import json
+import time
+import uuid
+import warmup
+
+POLL_SECONDS = 1
+TOP_STUDENTS = 10
+
+
+@st.cache_resource
+def result_cache():
+    # One disk cache shared by every session of this server process
+    return ResultCache()
+
+
+def parse_institutions(text):
+    # One institution per line; "all" keeps every institution in the PDF
+    names = [line.strip().upper() for line in text.splitlines() if line.strip()]
+    if any(name == ALL_INSTITUTIONS.upper() for name in names):
+        return ALL_INSTITUTIONS
+    if len(names) == 1:
+        return names[0]
+    return frozenset(names)
+
+
+@st.cache_resource
+def job_manager():
+    # Extraction runs in the job workers, not in the script run of a session
+    return JobManager()
+
+
+@st.cache_resource
+def warm_up():
+    # Once per server process: load the extraction engines in the background,
+    # here for cache lookups and in the job workers for the extraction
+    job_manager().warm_up()
+    return warmup.start()
+
+
+def session_owner():
+    # Jobs are scheduled fairly between browser sessions
+    return st.session_state.setdefault('owner', uuid.uuid4().hex)
+
+
+def cache_key(uploaded_file, fmt, institution):
+    if isinstance(institution, str) and institution != ALL_INSTITUTIONS:
+        return result_key(hash_source(uploaded_file), fmt, institution_key(institution), 'words')
+    return result_key(hash_source(uploaded_file), fmt, 'by-institution', institution_key(institution), 'words')
+
+
+def lookup(key):
+    # Session memo first, then the disk cache; None when the PDF has to be parsed
+    memo = st.session_state.setdefault('results', {})
+    metrics = Metrics()
+    if key in memo:
+        metrics.count('session_memo_hits')
+        return memo[key], metrics.as_dict()
+    cached = result_cache().get(key)
+    if cached is not None:
+        metrics.count('result_cache_hits')
+        memo[key] = cached['result']
+        return memo[key], metrics.as_dict()
+    return None
+
+
+def show_metrics(metrics):
+    # Collapsible timing panel: where the time of this run went
+    import pandas as pd
+
+    with st.expander("Extraction metrics"):
+        st.write("Time per stage (seconds)")
+        st.table(pd.DataFrame(sorted(metrics['stages'].items(), key=lambda item: -item[1]),
+                              columns=['Stage', 'Seconds']))
+        st.write("Counters")
+        st.table(pd.DataFrame(sorted(metrics['counters'].items()), columns=['Counter', 'Value']))
+        if metrics.get('memory'):
+            st.write("Peak memory (MB)")
+            st.table(pd.DataFrame(sorted(metrics['memory'].items()), columns=['Process', 'MB']))
+        if metrics['pages']:
+            st.write("Pages")
+            st.dataframe(pd.DataFrame(metrics['pages']))
+        if metrics['profile']:
+            st.code(metrics['profile'])
+
+
+def show_jobs():
+    # Status of this session's jobs. Returns True while any of them is still
+    # queued or running, so the caller polls again.
+    manager = job_manager()
+    memo = st.session_state.setdefault('results', {})
+    active = False
+
+    for entry in reversed(st.session_state.get('jobs', [])):
+        job = manager.status(entry['id'])
+        if job is None:
+            continue
+        st.subheader(f"{entry['name']} ({entry['format']})")
+
+        if job['status'] in (QUEUED, RUNNING):
+            active = True
+            total = job['pages_total']
+            if job['status'] == QUEUED:
+                st.progress(0.0, text="Queued")
+            elif total:
+                st.progress(min(job['pages_done'] / total, 1.0), text=f"Page {job['pages_done']} of {total}")
+            else:
+                st.progress(0.0, text="Scanning pages...")
+            if st.button("Cancel", key=f"cancel-{job['id']}"):
+                manager.cancel(job['id'])
+        elif job['status'] == DONE:
+            if entry['key'] not in memo:
+                finished = manager.result(job['id'])
+                memo[entry['key']] = finished['result']
+                entry['metrics'] = finished['metrics']
+            st.json(memo[entry['key']])
+            st.success(f"PDF processed in {entry['format']} format!")
+            if entry.get('metrics'):
+                show_metrics(entry['metrics'])
+        elif job['status'] == CANCELLED:
+            st.warning("Cancelled")
+        else:
+            st.error("Extraction failed")
+            st.code(job['error'])
+
+    return active
+
+
+def choose(label, values, key):
+    # Select box over the distinct values, "All" for no filter
+    choice = st.selectbox(label, ['All'] + sorted(v for v in set(values) if v is not None), key=key)
+    return None if choice == 'All' else choice
+
+
+def show_analytics():
+    # Ranks, pass rates and mark distributions from the rollups of the result
+    # store, filled by `cli.py --store` and `store.py ingest`
+    if not os.path.exists(DEFAULT_STORE_PATH):
+        return
+    with st.expander("Cohort analytics"), ResultStore(DEFAULT_STORE_PATH) as store:
+        conn = store.conn
+        cohorts = analytics.cohorts(conn)
+        if cohorts.empty:
+            st.write("The result store is empty.")
+            return
+        filters = {}
+        for column, label in (('institution', 'Institution'), ('batch', 'Batch'), ('programme', 'Programme'),
+                              ('sem', 'Semester'), ('examination', 'Examination')):
+            filters[column] = choose(label, cohorts[column], f'analytics-{column}')
+            if filters[column] is not None:
+                cohorts = cohorts[cohorts[column] == filters[column]]
+        st.write("Cohorts")
+        st.dataframe(cohorts, hide_index=True)
+
+        top = st.number_input("Top students per cohort", min_value=1, value=TOP_STUDENTS)
+        st.dataframe(analytics.ranks(conn, top=top, **filters), hide_index=True)
+
+        papers = analytics.paper_stats(conn, **filters)
+        st.write("Papers")
+        st.dataframe(papers, hide_index=True)
+        paper = choose("Marks distribution of paper", papers['paper'] if len(papers) else [], 'analytics-paper')
+        if paper is not None:
+            st.bar_chart(analytics.distribution(conn, paper, **filters), x='total', y='students')
+
+        enrollment = st.text_input("Enrollment number", key='analytics-enrollment').strip()
+        if enrollment:
+            st.write("Cumulative CGPA and rank in the batch and programme")
+            st.dataframe(analytics.cumulative(conn, enrollment=enrollment), hide_index=True)
+            st.write("Rank in every semester")
+            st.dataframe(analytics.ranks(conn, enrollment=enrollment), hide_index=True)
+
 
 def main():
     st.title('PDF Format Converter')
@@ -15,18 +188,36 @@ def main():
         st.write("File uploaded successfully!")
 
         # Format selection
-        format_option = st.selectbox("Choose the format", ["Format1", "Format2"])
+        format_option = st.selectbox("Choose the format", ["Auto", "Format1", "Format2"])
+        institutions = st.text_area("Institutions (one per line, or \"all\")", DEFAULT_INSTITUTION)
+        profile = st.checkbox("Capture a cProfile report")
 
         # Submit button
         if st.button("Submit"):
-            # Here you can add the code to process the PDF based on the selected format
-            if format_option == 'Format1':
-                res = format1(uploaded_file)
-            if format_option =='Format2':
-                res = format2(uploaded_file)
-            st.json(res)
-            st.success(f"PDF processed in {format_option} format!")
+            institution = parse_institutions(institutions)
+            key = cache_key(uploaded_file, format_option.lower(), institution)
+            found = lookup(key)
+            if found is not None:
+                res, metrics = found
+                st.json(res)
+                st.success(f"PDF processed in {format_option} format!")
+                show_metrics(metrics)
+            else:
+                # Spooled to disk in chunks; the job's worker reads that file
+                job_id = job_manager().submit(uploaded_file, format_option.lower(), institution,
+                                              owner=session_owner(), profiler='cprofile' if profile else None)
+                st.session_state.setdefault('jobs', []).append(
+                    {'id': job_id, 'key': key, 'name': uploaded_file.name, 'format': format_option})
+
+    show_analytics()
+
+    # The page is up; the engines can load while the user picks a file
+    warm_up()
 
+    if show_jobs():
+        # Poll the queue until this session's jobs have finished
+        time.sleep(POLL_SECONDS)
+        st.rerun()
 
 
 if __name__ == "__main__":
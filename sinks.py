@@ -0,0 +1,117 @@
+import importlib.util
+import json
+import os
+import tempfile
+
+
+class Unique:
+    # Type of UNIQUE; pickles as a reference to it, so `is` checks still
+    # hold in another process
+
+    def __repr__(self):
+        return 'sinks.UNIQUE'
+
+    def __reduce__(self):
+        return 'UNIQUE'
+
+
+# Pass as the output path to write each result to a new file of its own
+UNIQUE = Unique()
+
+
+def current_umask():
+    # os.umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once: setting the umask is process-wide, so doing it per write could
+# hand another thread's new files mode 0666
+UMASK = current_umask()
+
+
+def orjson_available():
+    return importlib.util.find_spec('orjson') is not None
+
+
+def write_atomic(path, write):
+    # write(tmp_path) next to `path`, then rename over it, so readers and
+    # concurrent writers never see half a file
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp' + os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file 0600; give it the mode open() would have
+        os.chmod(tmp_path, 0o666 & ~UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def plain(value):
+    # orjson fallback for numpy scalars and anything else it does not know
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class JsonSink:
+    # Where and how a result is written. path is None for no file, UNIQUE
+    # for a fresh file in `directory`, or a file path. indent=False writes
+    # compact JSON. With fast=True orjson encodes when it is installed; it
+    # writes NaN as null and indents by 2, where json writes NaN and 4.
+
+    def __init__(self, path=None, indent=True, fast=True, directory='.', prefix='result-'):
+        self.path = path
+        self.indent = indent
+        self.fast = fast and orjson_available()
+        self.directory = directory
+        self.prefix = prefix
+        self.written = None
+
+    def dumps(self, value):
+        if self.fast:
+            import orjson
+
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            if self.indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(value, default=plain, option=option)
+        if self.indent:
+            return json.dumps(value, indent=4).encode()
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def target(self):
+        if self.path is not UNIQUE:
+            return self.path
+        # Reserve the name, so two sinks never pick the same one
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=self.prefix, suffix='.json')
+        os.close(fd)
+        return path
+
+    def write(self, value):
+        # The path written to, or None when this sink writes no file
+        path = self.target()
+        if path is None:
+            return None
+        data = self.dumps(value)
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        write_atomic(path, write)
+        self.written = path
+        return path
+
+
+def json_sink(output):
+    # A JsonSink from the `output` argument of the extractors: a sink, None,
+    # UNIQUE or a path
+    if isinstance(output, JsonSink):
+        return output
+    return JsonSink(output)
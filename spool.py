@@ -0,0 +1,53 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# One on-disk copy of every PDF being extracted. An upload (a file object or
+# bytes) is spooled to a temp file once; a path is used in place. Everything
+# downstream gets the path: worker processes receive a short string instead
+# of the pickled document, tabula reads the file without spilling its own
+# copy, and pdfplumber reads a read-only mapping of it, so all processes
+# share the same page-cache pages instead of private buffers.
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def copy_source(source, f):
+    # Write the PDF bytes, a file object or the file at a path into f
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        f.write(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as src:
+            shutil.copyfileobj(src, f, CHUNK_SIZE)
+    else:
+        source.seek(0)
+        shutil.copyfileobj(source, f, CHUNK_SIZE)
+        source.seek(0)
+
+
+@contextmanager
+def spool(source, directory=None):
+    # The path of the PDF, spooled to a temp file in `directory` (the system
+    # temp dir by default) unless it already is one; removed on exit
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+    fd, path = tempfile.mkstemp(dir=directory, prefix='upload-', suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            copy_source(source, f)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def map_file(path):
+    # Read-only mapping of the file; a file object with read and seek
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file
+            return io.BytesIO()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import analytics
+from cache import DEFAULT_CACHE_DIR, EXTRACTOR_VERSION, hash_source
+from engine import ALL_INSTITUTIONS
+
+# Every gazette ever extracted, one row per student and per paper, in one
+# SQLite file with indexes on enrollment, batch, programme, semester and
+# paper ID. A gazette is ingested once with all of its institutions and
+# identified by the hash of its bytes, so ingesting it again is a lookup,
+# not an extraction. Queries return the long table of columnar.py. The
+# cohort rollups of analytics.py live in the same file and are kept up to
+# date by every ingest and removal.
+#
+#     python store.py ingest gazettes/*.pdf
+#     python store.py student 01320802722
+#     python store.py cohort --batch 2021 --programme "BACHELOR OF TECHNOLOGY (CSE)"
+
+DEFAULT_STORE_PATH = os.environ.get('RESULT_STORE', os.path.join(DEFAULT_CACHE_DIR, 'results.sqlite'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gazettes (
+    id INTEGER PRIMARY KEY,
+    pdf_hash TEXT NOT NULL UNIQUE,
+    name TEXT,
+    fmt TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    students INTEGER NOT NULL,
+    ingested REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    gazette_id INTEGER NOT NULL REFERENCES gazettes (id) ON DELETE CASCADE,
+    institution TEXT,
+    batch TEXT,
+    programme TEXT,
+    sem TEXT,
+    examination TEXT,
+    enrollment TEXT,
+    name TEXT,
+    cgpa REAL
+);
+CREATE TABLE IF NOT EXISTS papers (
+    student_id INTEGER NOT NULL REFERENCES students (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    paper TEXT,
+    credits INTEGER,
+    int_marks INTEGER,
+    ext_marks INTEGER,
+    total INTEGER,
+    total_raw TEXT,
+    counts_for_cgpa INTEGER,
+    PRIMARY KEY (student_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS students_enrollment ON students (enrollment);
+CREATE INDEX IF NOT EXISTS students_cohort ON students (batch, programme, sem, examination);
+CREATE INDEX IF NOT EXISTS students_programme ON students (programme, sem);
+CREATE INDEX IF NOT EXISTS students_gazette ON students (gazette_id);
+CREATE INDEX IF NOT EXISTS papers_paper ON papers (paper, student_id);
+"""
+
+# query() filter -> students column
+FILTERS = {
+    'enrollment': 'enrollment',
+    'batch': 'batch',
+    'programme': 'programme',
+    'sem': 'sem',
+    'examination': 'examination',
+    'institution': 'institution',
+}
+
+# Long-table column -> SELECT expression
+COLUMNS = {
+    'Institution': 's.institution',
+    'Batch': 's.batch',
+    'Programme Name': 's.programme',
+    'Sem': 's.sem',
+    'Examination': 's.examination',
+    'Enrollment': 's.enrollment',
+    'Name': 's.name',
+    'CGPA': 's.cgpa',
+    'Paper': 'p.paper',
+    'Credits': 'p.credits',
+    'Int_Marks': 'p.int_marks',
+    'Ext_Marks': 'p.ext_marks',
+    'Total': 'p.total',
+    'Total_Raw': 'p.total_raw',
+    'Counts_For_CGPA': 'p.counts_for_cgpa',
+}
+
+STUDENT_KEYS = ['Institution', 'Batch', 'Programme Name', 'Sem', 'Examination', 'Enrollment', 'Name']
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def plain_rows(df):
+    # Tuples of Python values, with None for every missing value
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+class ResultStore:
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = connect(path)
+        # Readers keep working while a CLI batch or a job worker ingests
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(papers)')}
+        if 'counts_for_cgpa' not in columns:
+            # A store from before the column; its papers are left NULL
+            self.conn.execute('ALTER TABLE papers ADD COLUMN counts_for_cgpa INTEGER')
+        analytics.attach(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def gazette(self, pdf_hash):
+        row = self.conn.execute('SELECT * FROM gazettes WHERE pdf_hash = ?', (pdf_hash,)).fetchone()
+        return None if row is None else dict(row)
+
+    def up_to_date(self, pdf_hash):
+        # The gazette is stored and was extracted by this extractor version
+        stored = self.gazette(pdf_hash)
+        return stored is not None and stored['extractor_version'] == EXTRACTOR_VERSION
+
+    def gazettes(self):
+        return [dict(row) for row in self.conn.execute('SELECT * FROM gazettes ORDER BY ingested')]
+
+    def ingest(self, file_stream, fmt='auto', name=None, force=False, workers=1):
+        # Extract the gazette with all its institutions and store it; returns
+        # its gazettes row. A gazette already stored by this extractor
+        # version is returned as it is unless force is set.
+        pdf_hash = hash_source(file_stream)
+        if self.up_to_date(pdf_hash) and not force:
+            return self.gazette(pdf_hash)
+
+        from columnar import extract_table
+
+        table = extract_table(file_stream, fmt, ALL_INSTITUTIONS, workers=workers)
+        if name is None and isinstance(file_stream, (str, os.PathLike)):
+            name = os.path.basename(file_stream)
+        return self.ingest_table(table, pdf_hash, name, fmt)
+
+    def ingest_table(self, table, pdf_hash, name=None, fmt='auto'):
+        # Store a long table (columnar.extract_table) as the gazette with
+        # hash pdf_hash, replacing what was stored for it before
+        import numpy as np
+
+        from columnar import PAPER_COLUMNS
+
+        table = table.reset_index(drop=True)
+        # A new student starts wherever the student columns change
+        keys = table[STUDENT_KEYS].astype(object).where(table[STUDENT_KEYS].notna(), '')
+        starts = (keys != keys.shift()).any(axis=1).to_numpy()
+        students = table[starts]
+        student_number = np.cumsum(starts) - 1
+        position = table.groupby(student_number).cumcount().to_numpy()
+        papers = table['Paper'].notna().to_numpy()
+
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.delete(pdf_hash)
+            gazette_id = conn.execute(
+                'INSERT INTO gazettes (pdf_hash, name, fmt, extractor_version, students, ingested) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (pdf_hash, name, fmt, EXTRACTOR_VERSION, len(students), time.time()),
+            ).lastrowid
+            # Ids are handed out here, inside the write lock, so the papers
+            # can reference their student without a round trip per student
+            first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM students').fetchone()[0]
+            conn.executemany(
+                'INSERT INTO students (id, gazette_id, institution, batch, programme, sem, examination, enrollment, '
+                'name, cgpa) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(first_id + k, gazette_id) + row
+                 for k, row in enumerate(plain_rows(students[STUDENT_KEYS + ['CGPA']]))],
+            )
+            paper_rows = table[papers]
+            conn.executemany(
+                'INSERT INTO papers (student_id, position, paper, credits, int_marks, ext_marks, total, total_raw, '
+                'counts_for_cgpa) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(int(first_id + number), int(k)) + row for number, k, row in zip(
+                    student_number[papers], position[papers],
+                    plain_rows(paper_rows[PAPER_COLUMNS]))],
+            )
+            analytics.add_terms(conn, gazette_id)
+            analytics.touch(conn, gazette_id)
+            analytics.refresh(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        # Keeps the planner statistics current, so a paper query filtered by
+        # batch starts from the narrower index
+        conn.execute('PRAGMA optimize')
+        return self.gazette(pdf_hash)
+
+    def delete(self, pdf_hash):
+        # Delete a stored gazette inside the caller's transaction, marking
+        # its cohorts and students for the next analytics.refresh
+        row = self.conn.execute('SELECT id FROM gazettes WHERE pdf_hash = ?', (pdf_hash,)).fetchone()
+        if row is not None:
+            analytics.touch(self.conn, row['id'])
+            self.conn.execute('DELETE FROM gazettes WHERE id = ?', (row['id'],))
+
+    def remove(self, pdf_hash):
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.delete(pdf_hash)
+            analytics.refresh(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def query(self, paper=None, **filters):
+        # The long table of every stored student matching the filters
+        # (enrollment, batch, programme, sem, examination, institution), in
+        # ingestion order. With paper, only that paper's rows.
+        from columnar import TABLE_COLUMNS, TABLE_DTYPES, empty_table
+        import pandas as pd
+
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        where = [f's.{FILTERS[key]} = ?' for key, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        if paper is not None:
+            where.append('p.paper = ?')
+            params.append(paper)
+
+        sql = (f"SELECT {', '.join(COLUMNS[column] for column in TABLE_COLUMNS)} "
+               'FROM students s LEFT JOIN papers p ON p.student_id = s.id'
+               + (f" WHERE {' AND '.join(where)}" if where else '') + ' ORDER BY s.id, p.position')
+        rows = self.conn.execute(sql, params).fetchall()
+        if not rows:
+            return empty_table()
+        return pd.DataFrame([tuple(row) for row in rows], columns=TABLE_COLUMNS).astype(TABLE_DTYPES)
+
+    def student(self, enrollment):
+        # Every stored result of one student, across gazettes and semesters
+        return self.query(enrollment=enrollment)
+
+    def cohort(self, batch=None, programme=None, sem=None, examination=None, institution=None):
+        return self.query(batch=batch, programme=programme, sem=sem, examination=examination,
+                          institution=institution)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest gazettes into the result store and query it')
+    parser.add_argument('--db', default=DEFAULT_STORE_PATH, help='store file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='extract and store PDFs')
+    ingest.add_argument('pdfs', nargs='+')
+    ingest.add_argument('--format', default='auto')
+    ingest.add_argument('--force', action='store_true', help='extract again even if already stored')
+    student = commands.add_parser('student', help='results of one enrollment number')
+    student.add_argument('enrollment')
+    cohort = commands.add_parser('cohort', help='results of a batch, programme and semester')
+    for option in ('batch', 'programme', 'sem', 'examination', 'institution', 'paper'):
+        cohort.add_argument(f'--{option}')
+    commands.add_parser('gazettes', help='list the stored gazettes')
+    args = parser.parse_args(argv)
+
+    with ResultStore(args.db) as store:
+        if args.command == 'ingest':
+            for pdf in args.pdfs:
+                start = time.perf_counter()
+                gazette = store.ingest(pdf, args.format, force=args.force)
+                print(f"{pdf}: {gazette['students']} students ({time.perf_counter() - start:.2f}s)")
+        elif args.command == 'gazettes':
+            print(json.dumps(store.gazettes(), indent=2))
+        else:
+            if args.command == 'student':
+                table = store.student(args.enrollment)
+            else:
+                table = store.query(paper=args.paper, batch=args.batch, programme=args.programme, sem=args.sem,
+                                    examination=args.examination, institution=args.institution)
+            print(table.to_csv(index=False), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.environ.get('TABULA_POOL_SIZE', '2'))
+DEFAULT_TIMEOUT = 600
+HEALTH_CHECK_TIMEOUT = 60
+# Pages read by one `java` process when there is no resident JVM
+SUBPROCESS_BATCH_PAGES = 50
+# Seconds before a pool that failed its health check is started again
+HEALTH_RETRY_INTERVAL = 300
+
+
+def jpype_available():
+    # tabula-py only keeps a JVM inside the Python process when jpype is
+    # installed; without it every call spawns `java`
+    return importlib.util.find_spec('jpype') is not None
+
+
+def warmup_pdf(path):
+    # A one-page PDF with a tiny table, used to load tabula's classes
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    page = doc.new_page()
+    for row, y in enumerate((72, 84, 96)):
+        for column, x in enumerate((72, 144)):
+            page.insert_text((x, y), f'{row}{column}')
+    doc.save(path)
+    doc.close()
+
+
+def start_jvm():
+    # Process-pool initializer: start the in-process JVM once and run one
+    # extraction so the first real request does not pay for class loading
+    import tabula
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'warmup.pdf')
+        warmup_pdf(path)
+        tabula.read_pdf(path, pages=1, silent=True)
+
+
+def jvm_running():
+    import jpype
+
+    return jpype.isJVMStarted()
+
+
+def read_in_worker(source, pages, options, per_page=False):
+    # With per_page, one list of tables for every page instead of a single
+    # list for all of them
+    import tabula
+
+    if isinstance(source, bytes):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(source)
+            f.flush()
+            return read_in_worker(f.name, pages, options, per_page)
+    if per_page:
+        return [tabula.read_pdf(source, pages=page, **options) for page in pages]
+    return tabula.read_pdf(source, pages=pages, **options)
+
+
+def read_with_subprocess(source, pages, options):
+    # Fallback: a fresh `java` process for this call only
+    return read_in_worker(source, pages, dict(options, force_subprocess=True))
+
+
+def split_pages(source, pages, directory):
+    # Copy every page into a one-page PDF of its own in directory; returns
+    # their paths in page order
+    import fitz  # PyMuPDF
+
+    paths = []
+    with (fitz.open(stream=source, filetype='pdf') if isinstance(source, bytes) else fitz.open(source)) as doc:
+        for page in pages:
+            single = fitz.open()
+            single.insert_pdf(doc, from_page=page - 1, to_page=page - 1)
+            paths.append(os.path.join(directory, f'{page:06d}.pdf'))
+            single.save(paths[-1])
+            single.close()
+    return paths
+
+
+def column_names(header):
+    # Column names from a header row the way read_pdf makes them: empty
+    # cells become 'Unnamed: n' and repeated names get '.1', '.2', ...
+    names = []
+    counts = {}
+    unnamed = 0
+    for name in header:
+        if name is None:
+            name = f'Unnamed: {unnamed}'
+            unnamed += 1
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f'{name}.{count}'
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names.append(name)
+    return names
+
+
+def json_tables(raw_json):
+    # The DataFrames read_pdf(multiple_tables=True) makes of tabula-java's
+    # JSON output: the first row names the columns, empty cells are NaN and
+    # every column that parses as numbers is made numeric
+    import numpy as np
+    import pandas as pd
+
+    tables = []
+    for table in raw_json:
+        rows = [[cell['text'] or None for cell in row] for row in table['data']]
+        if not rows:
+            continue
+        df = pd.DataFrame([[np.nan if text is None else text for text in row] for row in rows[1:]],
+                          columns=column_names(rows[0]))
+        for column in df.columns:
+            try:
+                df[column] = pd.to_numeric(df[column], errors='raise')
+            except (ValueError, TypeError):
+                pass
+        tables.append(df)
+    return tables
+
+
+def read_pages_with_subprocess(source, pages, options, batch_pages=SUBPROCESS_BATCH_PAGES):
+    # Fallback for reads page by page: tabula's batch mode reads a directory
+    # of one-page PDFs with a single `java` process and writes one JSON file
+    # for each, so batch_pages pages cost one JVM start instead of one each.
+    # pandas_options are only understood by read_pdf, so with them every
+    # page gets a java process of its own.
+    import tabula
+
+    if options.get('pandas_options'):
+        return [read_with_subprocess(source, page, options) for page in pages]
+    options = dict(options)
+    options.pop('multiple_tables', None)
+    options.pop('pandas_options', None)
+    tables = []
+    for start in range(0, len(pages), batch_pages):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = split_pages(source, pages[start:start + batch_pages], tmp)
+            tabula.convert_into_by_batch(tmp, output_format='json', pages='all', force_subprocess=True, **options)
+            for path in paths:
+                with open(os.path.splitext(path)[0] + '.json') as f:
+                    tables.append(json_tables(json.load(f)))
+    return tables
+
+
+def jvm_answers(executor, timeout):
+    # True when a worker of executor answers with a running JVM in time
+    try:
+        return executor.submit(jvm_running).result(timeout=timeout)
+    except Exception as e:
+        # A broken pool, a timeout, or whatever the JVM start raised
+        logger.warning("tabula pool failed its health check: %s", e)
+        return False
+
+
+class TabulaPool:
+    # Resident worker processes that each keep a warm JVM (tabula-py's jpype
+    # mode) and serve read_pdf requests from any thread or session. A new
+    # pool is only used once a worker has passed the health check. When
+    # jpype is missing or the check fails, calls fall back to tabula's
+    # subprocess mode, and the pool is tried again after retry_interval
+    # seconds.
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, retry_interval=HEALTH_RETRY_INTERVAL):
+        self.size = size
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.executor = None
+        self.failed_at = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            retry = self.failed_at is None or time.monotonic() - self.failed_at >= self.retry_interval
+            if self.executor is None and retry and jpype_available():
+                # spawn, so no worker inherits a half-initialised JVM
+                context = multiprocessing.get_context('spawn')
+                executor = ProcessPoolExecutor(max_workers=self.size, mp_context=context, initializer=start_jvm)
+                if jvm_answers(executor, HEALTH_CHECK_TIMEOUT):
+                    self.executor, self.failed_at = executor, None
+                else:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.failed_at = time.monotonic()
+            return self.executor is not None
+
+    def stop(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def read_pdf(self, source, pages, per_page=False, **options):
+        # source is a path or the PDF bytes; both can be sent to a worker
+        if self.start():
+            try:
+                return self.executor.submit(read_in_worker, source, pages, options, per_page).result(
+                    timeout=self.timeout)
+            except (BrokenProcessPool, FutureTimeoutError) as e:
+                logger.warning("tabula pool failed, falling back to subprocess mode: %s", e)
+                self.stop()
+        if per_page:
+            return read_pages_with_subprocess(source, pages, options)
+        return read_with_subprocess(source, pages, options)
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool():
+    # The pool every extraction in this process uses
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = TabulaPool()
+        return _shared_pool
+
+
+def read_pdf(source, pages, **options):
+    return shared_pool().read_pdf(source, pages, **options)
+
+
+def read_pages(source, pages, **options):
+    # The tables of every page, as one list per page: tabula's output does not
+    # say which page a table came from. Without a resident JVM the pages are
+    # read in batches of SUBPROCESS_BATCH_PAGES, one java process each.
+    return shared_pool().read_pdf(source, pages, per_page=True, **options)
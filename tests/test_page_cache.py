@@ -0,0 +1,43 @@
+# The page cache of engine.iter_cached_pages against pages whose content
+# stream is the same on every page: each page only draws a form XObject of
+# its own, so the pages differ only in their forms.
+import os
+import sys
+
+import fitz  # PyMuPDF
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from cache import ResultCache
+from engine import ALL_INSTITUTIONS, open_document, page_fingerprint
+from records import extract
+from synth import make_gazette
+
+
+def form_gazette(tmp_path, pages=3):
+    # A synthetic gazette with every page redrawn as a form XObject
+    plain = str(tmp_path / 'plain.pdf')
+    make_gazette(plain, 'format1', pages=pages, students_per_page=8)
+    path = str(tmp_path / 'forms.pdf')
+    with fitz.open(plain) as source, fitz.open() as doc:
+        for page in source:
+            doc.new_page(width=page.rect.width, height=page.rect.height).show_pdf_page(page.rect, source, page.number)
+        doc.save(path)
+    return path
+
+
+def test_form_pages_differ(tmp_path):
+    path = form_gazette(tmp_path)
+    with open_document(path) as doc:
+        assert len({doc[i].read_contents() for i in range(doc.page_count)}) == 1
+        assert len({page_fingerprint(doc[i]) for i in range(doc.page_count)}) == doc.page_count
+
+
+def test_warm_page_cache(tmp_path):
+    path = form_gazette(tmp_path)
+    page_cache = ResultCache(str(tmp_path / 'pages'))
+    cold = extract(path, 'format1', ALL_INSTITUTIONS, page_cache=page_cache)
+    warm = extract(path, 'format1', ALL_INSTITUTIONS, page_cache=page_cache)
+    assert warm == cold == extract(path, 'format1', ALL_INSTITUTIONS)
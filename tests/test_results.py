@@ -0,0 +1,33 @@
+# Nested results of the format1/format2 entry points for one institution and
+# for several, from a synthetic gazette shared between institutions.
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from engine import ALL_INSTITUTIONS, DEFAULT_INSTITUTION
+from result import format1
+from result2 import format2
+from synth import make_gazette
+
+ENTRY_POINTS = {'format1': format1, 'format2': format2}
+
+
+@pytest.mark.parametrize('fmt', ['format1', 'format2'])
+def test_keyed_by_institution(tmp_path, fmt):
+    pdf = str(tmp_path / f'{fmt}.pdf')
+    make_gazette(pdf, fmt, pages=8, students_per_page=5, target_share=0.5, pages_per_programme=2, seed=3)
+    extract = ENTRY_POINTS[fmt]
+
+    single = extract(pdf, institution=DEFAULT_INSTITUTION, output=None)
+    everyone = extract(pdf, institution=ALL_INSTITUTIONS, output=None)
+    assert len(everyone) > 1
+    assert everyone[DEFAULT_INSTITUTION] == single
+
+    others = [name for name in everyone if name != DEFAULT_INSTITUTION]
+    chosen = extract(pdf, institution=[DEFAULT_INSTITUTION, others[0]], output=str(tmp_path / 'result.json'))
+    assert chosen == {name: everyone[name] for name in (DEFAULT_INSTITUTION, others[0])}
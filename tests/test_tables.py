@@ -0,0 +1,54 @@
+# Result tables of synthetic gazettes whose pages hold text that does not
+# fit the columns: a footer across the page and names running into the next
+# column. Every student is still extracted, with the whole name.
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from columnar import extract_table
+from engine import ALL_INSTITUTIONS
+from metrics import collect
+from synth import LONG_NAME, make_gazette
+
+
+def students(tmp_path, fmt, **options):
+    pdf = str(tmp_path / f'{fmt}.pdf')
+    expected = make_gazette(pdf, fmt, pages=3, students_per_page=5, **options)
+    with collect() as metrics:
+        table = extract_table(pdf, fmt, ALL_INSTITUTIONS)
+    return expected, table.drop_duplicates('Enrollment'), metrics
+
+
+@pytest.mark.parametrize('fmt', ['format1', 'format2'])
+def test_footer(tmp_path, fmt):
+    expected, table, metrics = students(tmp_path, fmt, footer=True)
+    assert len(table) == expected
+    assert not metrics.counters.get('pages_no_key_column')
+
+
+@pytest.mark.parametrize('fmt', ['format1', 'format2'])
+def test_long_name(tmp_path, fmt):
+    expected, table, metrics = students(tmp_path, fmt, long_names=True)
+    assert len(table) == expected
+    assert table['Name'].str.endswith(LONG_NAME).sum() == 3
+    assert table['Paper'].notna().all()
+    assert not metrics.counters.get('pages_no_key_column')
+
+
+@pytest.mark.parametrize('fmt', ['format1', 'format2'])
+def test_totals_aligned(tmp_path, fmt):
+    # Every total is its own paper's internal plus external marks, also on
+    # papers after an ABS one
+    pdf = str(tmp_path / f'{fmt}.pdf')
+    make_gazette(pdf, fmt, pages=10, students_per_page=10)
+    table = extract_table(pdf, fmt, ALL_INSTITUTIONS)
+    absent = table['Total_Raw'] == 'ABS'
+    assert absent.any()
+    assert table.loc[absent, 'Total'].isna().all()
+    marked = table[~absent]
+    assert (marked['Total'] == marked['Int_Marks'] + marked['Ext_Marks']).all()
@@ -0,0 +1,29 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The entry points (scrap.py, cli.py, records.py, result.py, result2.py) import
+# the heavy libraries only once an extraction needs them. A long-lived process
+# can load them ahead of time instead: the Streamlit app starts this once its
+# first page has rendered, and has its job workers do the same.
+ENGINE_MODULES = ('pandas', 'pdfplumber', 'fitz', 'cleaning', 'model')
+
+
+def preload(modules=ENGINE_MODULES):
+    # Import the modules now; returns the seconds it took
+    start = time.perf_counter()
+    for name in modules:
+        importlib.import_module(name)
+    seconds = time.perf_counter() - start
+    logger.debug("preloaded %s in %.2fs", ', '.join(modules), seconds)
+    return seconds
+
+
+def start(modules=ENGINE_MODULES):
+    # preload in a daemon thread, so the caller is not held up
+    thread = threading.Thread(target=preload, args=(modules,), name='warmup', daemon=True)
+    thread.start()
+    return thread